@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# Compares a full licencpp run with the serial metadata loop (--jobs 1) against the thread pool (--jobs N).
+# The metadata cache is disabled so that every run reads all the ports.
+# Use --workdir to place the synthetic registry on the file system to measure (e.g. an NFS mount).
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+
+LICENCPP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'licencpp.py')
+
+
+def run_licencpp(workspace, jobs):
+    command = [sys.executable, LICENCPP, '--vcpkg_ports_dir', workspace['ports_dir'],
+               '--vcpkg_executable', workspace['vcpkg_executable'], '--no_cache', '--jobs', str(jobs)]
+    start = time.perf_counter()
+    subprocess.run(command, cwd=workspace['project_dir'], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark --jobs against the serial metadata loop')
+    parser.add_argument('--ports', type=int, default=500, help='Number of synthetic ports')
+    parser.add_argument('--jobs', type=int, default=8, help='Threads for the parallel run')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per configuration, the best one is reported')
+    parser.add_argument('--workdir', default=None, help='Folder in which the synthetic registry is created')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as root:
+        workspace = synthetic.build_workspace(root, args.ports)
+        for jobs in (1, args.jobs):
+            best = min(run_licencpp(workspace, jobs) for _ in range(args.repeat))
+            print(f'{len(workspace["graph"])} ports, --jobs {jobs}: {best * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# Times the normalization of the license string of every port, as done when building the SPDX document.
+# The strings come from the vcpkg.json files of --vcpkg_ports_dir (e.g. a vcpkg clone) or, without it, are random
+# expressions over the bundled license list, mixed with deprecated identifiers, odd case and non-SPDX leftovers.
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+LEFTOVERS = ['public domain', 'MIT/X11', 'See LICENSE file', 'BSD', 'GPLv2+', 'Proprietary']
+
+
+def read_registry_licenses(ports_dir):
+    licenses = []
+    for name in sorted(os.listdir(ports_dir)):
+        try:
+            with open(os.path.join(ports_dir, name, 'vcpkg.json'), 'r', encoding='utf-8') as file:
+                license = json.load(file).get('license')
+        except (OSError, ValueError):
+            continue
+        if isinstance(license, str):
+            licenses.append(license)
+    return licenses
+
+
+def make_synthetic_licenses(spdx_licenses, count, seed=0):
+    rng = random.Random(seed)
+    identifiers = spdx_licenses.LICENSE_IDS.split()
+    deprecated = spdx_licenses.DEPRECATED_LICENSE_IDS.split()
+    exceptions = spdx_licenses.EXCEPTION_IDS.split()
+
+    def make_identifier():
+        roll = rng.random()
+        if roll < 0.1:
+            return rng.choice(deprecated)
+        if roll < 0.2:
+            return rng.choice(identifiers).lower()
+        if roll < 0.25:
+            return f'{rng.choice(identifiers)} WITH {rng.choice(exceptions)}'
+        return rng.choice(identifiers)
+
+    licenses = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            licenses.append(rng.choice(LEFTOVERS))
+        elif roll < 0.6:
+            licenses.append(make_identifier())
+        elif roll < 0.85:
+            licenses.append(f'{make_identifier()} {rng.choice(["AND", "OR", "and", "or"])} {make_identifier()}')
+        else:
+            licenses.append(f'{make_identifier()} AND ({make_identifier()} OR {make_identifier()})')
+    return licenses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SPDX license expression normalization')
+    parser.add_argument('--vcpkg_ports_dir', default=None, help='Ports folder whose license strings are normalized')
+    parser.add_argument('--ports', type=int, default=2500, help='Number of synthetic license strings')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs, the best one is reported')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    import spdx_licenses
+    import_time = time.perf_counter() - start
+    if args.vcpkg_ports_dir:
+        licenses = read_registry_licenses(args.vcpkg_ports_dir)
+    else:
+        licenses = make_synthetic_licenses(spdx_licenses, args.ports)
+
+    cold = warm = None
+    for _ in range(args.repeat):
+        spdx_licenses.parse_license_expression.cache_clear()
+        spdx_licenses.normalize_license_expression.cache_clear()
+        spdx_licenses.interned_nodes.clear()
+        start = time.perf_counter()
+        for license in licenses:
+            spdx_licenses.normalize_license_expression(license)
+        elapsed = time.perf_counter() - start
+        cold = elapsed if cold is None else min(cold, elapsed)
+        start = time.perf_counter()
+        for license in licenses:
+            spdx_licenses.normalize_license_expression(license)
+        elapsed = time.perf_counter() - start
+        warm = elapsed if warm is None else min(warm, elapsed)
+
+    print(f'{len(licenses)} license strings, {len(set(licenses))} distinct, '
+          f'{len(spdx_licenses.interned_nodes)} interned nodes')
+    print(f'import spdx_licenses {import_time * 1000:7.1f} ms')
+    print(f'cold caches          {cold * 1000:7.1f} ms')
+    print(f'warm caches          {warm * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
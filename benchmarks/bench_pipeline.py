@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# Times every stage of the licencpp pipeline separately on synthetic registries of increasing size:
+#   parse_dgml       streaming the DGML graph
+#   metadata_cold    get_data_from_vcpkg_json over every node, without the metadata cache
+#   metadata_warm    the same with a warm metadata cache
+#   build_spdx       building the SPDX document
+#   spdx_yaml        serializing it as YAML
+#   spdx_json        serializing it as JSON
+#   end_to_end       the command line, with a stub in place of the vcpkg executable
+# The results are written as JSON (--output) so that they can be tracked between revisions; --compare checks them
+# against a previous results file and exits with status 1 if a stage got slower than --threshold allows.
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+LICENCPP = os.path.join(SOURCE_DIR, 'licencpp.py')
+sys.path.insert(0, SOURCE_DIR)
+
+import licencpp  # noqa: E402
+
+
+def best_time(function, repeat, setup=None):
+    best = None
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        result = function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SOURCE_DIR, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_size(root, num_ports, repeat):
+    workspace = synthetic.build_workspace(root, num_ports)
+    project_dir = workspace['project_dir']
+    cache_dir = os.path.join(root, 'cache')
+    with open(os.path.join(project_dir, 'vcpkg.json'), 'r') as file:
+        project_data = json.load(file)
+    new_registry = lambda use_cache: licencpp.PortRegistry(workspace['ports_dir'], cache_dir=cache_dir, use_cache=use_cache)
+    stages = {}
+
+    stages['parse_dgml'], nodes = best_time(lambda _: licencpp.parse_dgml(workspace['dgml']), repeat)
+    stages['metadata_cold'], dependencies_info = best_time(
+        lambda registry: licencpp.load_metadata(nodes, registry), repeat, lambda: new_registry(False))
+    warm_registry = new_registry(True)
+    licencpp.load_metadata(nodes, warm_registry)
+    warm_registry.save_cache()
+    stages['metadata_warm'], _ = best_time(
+        lambda registry: licencpp.load_metadata(nodes, registry), repeat, lambda: new_registry(True))
+    stages['build_spdx'], document = best_time(lambda _: licencpp.build_spdx(project_data, dependencies_info), repeat)
+    stages['spdx_yaml'], _ = best_time(lambda output: licencpp.write_spdx_yaml(document, output), repeat, io.StringIO)
+    stages['spdx_json'], _ = best_time(lambda output: licencpp.write_spdx_json(document, output), repeat, io.StringIO)
+
+    command = [sys.executable, LICENCPP, '--vcpkg_ports_dir', workspace['ports_dir'],
+               '--vcpkg_executable', workspace['vcpkg_executable'], '--no_cache']
+    stages['end_to_end'], _ = best_time(
+        lambda _: subprocess.run(command, cwd=project_dir, check=True, stdout=subprocess.DEVNULL), repeat)
+    return {'ports': len(nodes), 'seconds': stages}
+
+
+def compare_results(baseline, results, threshold):
+    baseline_runs = {run['ports']: run['seconds'] for run in baseline.get('runs', [])}
+    regressions = []
+    for run in results['runs']:
+        previous = baseline_runs.get(run['ports'])
+        if previous is None:
+            continue
+        for stage, seconds in run['seconds'].items():
+            if stage in previous and seconds > previous[stage] * threshold:
+                regressions.append(f'{run["ports"]} ports, {stage}: {previous[stage] * 1000:.1f} ms -> {seconds * 1000:.1f} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every stage of the licencpp pipeline')
+    parser.add_argument('--ports', default='100,1000,10000',
+                        help='Comma separated numbers of synthetic ports, one registry per size')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage, the best one is reported')
+    parser.add_argument('--workdir', default=None, help='Folder in which the synthetic registries are created')
+    parser.add_argument('--output', default=None, help='JSON file receiving the results (default: stdout only)')
+    parser.add_argument('--compare', default=None, help='Previous results file to check the new results against')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown ratio above which --compare reports a regression')
+    args = parser.parse_args()
+
+    results = {
+        'licencpp_version': licencpp.SCRIPT_VERSION,
+        'git_revision': get_git_revision(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'runs': [],
+    }
+    for num_ports in (int(size) for size in args.ports.split(',')):
+        with tempfile.TemporaryDirectory(dir=args.workdir) as root:
+            run = bench_size(root, num_ports, args.repeat)
+        results['runs'].append(run)
+        stages = ', '.join(f'{stage} {seconds * 1000:.1f} ms' for stage, seconds in run['seconds'].items())
+        print(f'{run["ports"]} ports: {stages}', file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            regressions = compare_results(json.load(file), results, args.threshold)
+        for regression in regressions:
+            print(f'Regression: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# Generates the SPDX document of a synthetic 5,000-port project with licencpp, checks that it is byte-identical
+# to what the pure Python yaml.dump produces for the same document, and times both YAML dumpers on it.
+# Some synthetic descriptions are long and non-ASCII, which licencpp must not hand to libyaml; --ascii replaces
+# them so that the libyaml path is measured as well.
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+import synthetic
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+LICENCPP = os.path.join(SOURCE_DIR, 'licencpp.py')
+sys.path.insert(0, SOURCE_DIR)
+
+import licencpp  # noqa: E402
+
+
+def time_dump(document, dumper, repeat):
+    best = None
+    for _ in range(repeat):
+        output = io.StringIO()
+        start = time.perf_counter()
+        yaml.dump(document, output, Dumper=dumper, sort_keys=False, default_flow_style=False)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.getvalue()
+
+
+def make_descriptions_ascii(ports_dir):
+    for name in os.listdir(ports_dir):
+        path = os.path.join(ports_dir, name, 'vcpkg.json')
+        with open(path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        if isinstance(manifest.get('description'), str):
+            manifest['description'] = manifest['description'].encode('ascii', 'replace').decode('ascii')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SPDX YAML serialization')
+    parser.add_argument('--ports', type=int, default=5000, help='Number of synthetic ports')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per dumper, the best one is reported')
+    parser.add_argument('--ascii', default=False, action='store_true',
+                        help='Make every synthetic description ASCII, so that licencpp writes through libyaml')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        workspace = synthetic.build_workspace(root, args.ports)
+        if args.ascii:
+            make_descriptions_ascii(workspace['ports_dir'])
+        subprocess.run([sys.executable, LICENCPP, '--vcpkg_ports_dir', workspace['ports_dir'],
+                        '--vcpkg_executable', workspace['vcpkg_executable'], '--no_cache'],
+                       cwd=workspace['project_dir'], check=True, stdout=subprocess.DEVNULL)
+        with open(os.path.join(workspace['project_dir'], 'project_spdx_document.spdx.yaml'), 'r') as file:
+            written = file.read()
+
+    document = yaml.load(written, Loader=yaml.SafeLoader)
+    print(f'{len(document["packages"])} packages, {len(written) / 1e6:.1f} MB of YAML, '
+          f'written through {"libyaml" if yaml.__with_libyaml__ and licencpp.is_printable_ascii_document(document) else "the pure Python emitter"}')
+    python_time, python_output = time_dump(document, yaml.Dumper, args.repeat)
+    print(f'yaml.Dumper:  {python_time * 1000:.0f} ms')
+    if yaml.__with_libyaml__:
+        c_time, _ = time_dump(document, yaml.CDumper, args.repeat)
+        print(f'yaml.CDumper: {c_time * 1000:.0f} ms ({python_time / c_time:.1f}x)')
+    else:
+        print('yaml.CDumper: not available (PyYAML built without libyaml)')
+    print('licencpp output identical to yaml.Dumper:', written == python_output)
+
+
+if __name__ == '__main__':
+    main()
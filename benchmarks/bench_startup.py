@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# Measures the wall time of short licencpp invocations, where interpreter start-up and module imports dominate:
+# --help, a run on a small project with a warm metadata cache, and the same run without the cache.
+# Use --licencpp to compare against another version of the script (e.g. an older checkout),
+# and --frozen to also measure a PyInstaller build (e.g. dist/licencpp).
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+
+LICENCPP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'licencpp.py')
+
+
+def time_command(command, cwd, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(name, executable, workspace, cache_dir, repeat):
+    options = ['--vcpkg_ports_dir', workspace['ports_dir'], '--vcpkg_executable', workspace['vcpkg_executable']]
+    cwd = workspace['project_dir']
+    # One untimed run fills the metadata cache for the warm runs
+    subprocess.run(executable + options + ['--cache_dir', cache_dir], cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+    results = [
+        ('--help', time_command(executable + ['--help'], cwd, repeat)),
+        ('warm cache', time_command(executable + options + ['--cache_dir', cache_dir], cwd, repeat)),
+        ('no cache', time_command(executable + options + ['--no_cache'], cwd, repeat)),
+    ]
+    for label, best in results:
+        print(f'{name:>8} {label:<12} {best * 1000:7.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the start-up time of short licencpp runs')
+    parser.add_argument('--ports', type=int, default=20, help='Number of synthetic ports')
+    parser.add_argument('--repeat', type=int, default=10, help='Runs per command, the best one is reported')
+    parser.add_argument('--licencpp', default=LICENCPP, help='licencpp.py to run with the current interpreter')
+    parser.add_argument('--frozen', default=None, help='Frozen licencpp executable to measure as well')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        workspace = synthetic.build_workspace(root, args.ports)
+        print(f'{len(workspace["graph"])} ports, best of {args.repeat}')
+        measure('source', [sys.executable, args.licencpp], workspace, os.path.join(root, 'cache-source'), args.repeat)
+        if args.frozen:
+            measure('frozen', [os.path.abspath(args.frozen)], workspace, os.path.join(root, 'cache-frozen'), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# Helpers shared by the benchmarks: they generate a synthetic ports registry, a project using all of it,
+# the matching DGML graph and a stub vcpkg executable that replays that graph.
+
+import json
+import os
+import random
+import stat
+import sys
+
+DGML_NAMESPACE = 'http://schemas.microsoft.com/vs/2009/dgml'
+LICENSES = ['MIT', 'BSD-3-Clause', 'Apache-2.0', 'BSL-1.0', 'Zlib', 'LGPL-2.1-or-later',
+            'MIT OR Apache-2.0', 'BSD-2-Clause AND MIT', None]
+PLATFORMS = [None, None, None, 'windows', '!windows', '!uwp', 'linux | osx', 'windows & !uwp']
+
+
+def port_name(index):
+    return f'port-{index:05d}'
+
+
+def make_port_manifest(index, dependencies, rng):
+    manifest = {'name': port_name(index)}
+    scheme = rng.choice(['version', 'version', 'version-semver', 'version-date', 'version-string'])
+    manifest[scheme] = '2024-01-15' if scheme == 'version-date' else f'{rng.randint(0, 9)}.{rng.randint(0, 30)}.{rng.randint(0, 9)}'
+    if rng.random() < 0.3:
+        manifest['port-version'] = rng.randint(1, 5)
+    if index % 10 == 0:
+        # Real descriptions are not all ASCII, and long non-ASCII strings are where YAML emitters differ
+        manifest['description'] = (f'Synthetic port number {index} – header-only, with sinks, formatting and '
+                                   f'async logging for C++ projects; benchmarks licencpp’s SPDX writer')
+    elif rng.random() < 0.5:
+        manifest['description'] = f'Synthetic port number {index} used for benchmarking licencpp'
+    else:
+        manifest['description'] = [f'Synthetic port number {index}.', 'It is split over several lines like some real ports.']
+    manifest['homepage'] = f'https://example.com/{port_name(index)}'
+    license = rng.choice(LICENSES)
+    if license is not None:
+        manifest['license'] = license
+    if rng.random() < 0.2:
+        manifest['supports'] = '!(uwp | arm)'
+    entries = []
+    for dependency in dependencies:
+        platform = rng.choice(PLATFORMS)
+        if platform is None and rng.random() < 0.5:
+            entries.append(dependency)
+        else:
+            entry = {'name': dependency}
+            if platform is not None:
+                entry['platform'] = platform
+            entries.append(entry)
+    entries.append({'name': 'vcpkg-cmake', 'host': True})
+    manifest['dependencies'] = entries
+    if rng.random() < 0.3:
+        manifest['features'] = {
+            'tools': {'description': 'Build the command line tools'},
+            'docs': {'description': 'Build the documentation', 'supports': 'native'},
+        }
+    return manifest
+
+
+def generate_registry(ports_dir, num_ports, max_dependencies=4, seed=0):
+    """Writes num_ports synthetic ports (plus vcpkg-cmake) and returns {port: [dependencies]}.
+
+    Dependencies only point to lower indexes, so the graph is acyclic like a real registry.
+    """
+    rng = random.Random(seed)
+    graph = {}
+    for index in range(num_ports):
+        candidates = range(max(0, index - 50), index)
+        count = min(len(candidates), rng.randint(0, max_dependencies))
+        dependencies = [port_name(i) for i in sorted(rng.sample(candidates, count))]
+        graph[port_name(index)] = dependencies + ['vcpkg-cmake']
+        write_port(ports_dir, port_name(index), make_port_manifest(index, dependencies, rng))
+    graph['vcpkg-cmake'] = []
+    write_port(ports_dir, 'vcpkg-cmake', {'name': 'vcpkg-cmake', 'version-date': '2024-04-23', 'license': 'MIT'})
+    return graph
+
+
+def write_port(ports_dir, name, manifest):
+    os.makedirs(os.path.join(ports_dir, name), exist_ok=True)
+    with open(os.path.join(ports_dir, name, 'vcpkg.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+
+def write_project(project_dir, graph, name='bench-project'):
+    # The project depends on every port, so the full registry ends up in the graph
+    os.makedirs(project_dir, exist_ok=True)
+    manifest = {'name': name, 'version': '1.0.0', 'license': 'MIT',
+                'dependencies': sorted(port for port in graph if port != 'vcpkg-cmake')}
+    with open(os.path.join(project_dir, 'vcpkg.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    full_graph = dict(graph)
+    full_graph[name] = manifest['dependencies']
+    return name, full_graph
+
+
+def write_dgml(path, graph, root):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        file.write(f'<DirectedGraph xmlns="{DGML_NAMESPACE}">\n<Nodes>\n')
+        file.write(f'<Node Id="{root}" />\n')
+        for node in graph:
+            if node != root:
+                file.write(f'<Node Id="{node}" />\n')
+        file.write('</Nodes>\n<Links>\n')
+        for source, targets in graph.items():
+            for target in targets:
+                file.write(f'<Link Source="{source}" Target="{target}" />\n')
+        file.write('</Links>\n</DirectedGraph>\n')
+
+
+def write_vcpkg_stub(path, dgml_path):
+    # Stands in for 'vcpkg depend-info': it prints the prepared DGML document whatever the arguments
+    with open(path, 'w') as file:
+        file.write(f'#!{sys.executable}\n')
+        file.write('import sys\n')
+        file.write(f'with open({dgml_path!r}, "rb") as dgml:\n')
+        file.write('    sys.stdout.buffer.write(dgml.read())\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def build_workspace(root, num_ports, seed=0):
+    """Creates ports/, project/ and a stub vcpkg under root, returns a dict with their paths."""
+    ports_dir = os.path.join(root, 'ports')
+    project_dir = os.path.join(root, 'project')
+    graph = generate_registry(ports_dir, num_ports, seed=seed)
+    project_name, full_graph = write_project(project_dir, graph)
+    dgml_path = os.path.join(root, 'graph.dgml')
+    write_dgml(dgml_path, full_graph, project_name)
+    vcpkg_stub = os.path.join(root, 'vcpkg_stub.py')
+    write_vcpkg_stub(vcpkg_stub, dgml_path)
+    return {'ports_dir': ports_dir, 'project_dir': project_dir, 'dgml': dgml_path,
+            'vcpkg_executable': vcpkg_stub, 'graph': full_graph, 'project_name': project_name}
@@ -9,99 +9,210 @@ See file LICENSE or go to https://opensource.org/licenses/MIT for full license d
 
 # This script reads a project's vcpkg.json file to get the project name, then uses vcpkg to generate a DGML file of the project's dependencies.
 # It then reads the DGML file to extract the names of the dependencies, and reads each dependency's vcpkg.json file to extract its license.
+#
+# Nothing runs at import time: the pipeline is available as a library through
+#   registry = PortRegistry(vcpkg_ports_dir, vcpkg_additional_registry)
+#   nodes, links = resolve_graph(project_data, registry, ...)
+#   dependencies_info = load_metadata(nodes, registry, ...)
+#   spdx_document = build_spdx(project_data, dependencies_info, DependencyGraph(dependencies_info, links))
+# and a single PortRegistry can be shared by any number of projects. main() is the command line interface.
 
+# Only cheap modules are imported here. yaml, xml.etree, subprocess, the HTTP server and the other heavier modules
+# are imported by the functions that need them, so that each mode only pays for what it uses; this matters most for
+# the PyInstaller one-file build, where every import is unpacked from the archive.
+import functools
+import io
 import json
 import os
-import subprocess
-import xml.etree.ElementTree as ET
-import datetime
-import yaml
-import argparse
+import time
+import sys
 from sys import exit
 
 SCRIPT_NAME = "licencpp"
 SCRIPT_VERSION = "0.2.5"
 SCRIPT_LICENSE = "MIT"
 
-# Display welcome message
-print(f"Welcome to {SCRIPT_NAME} v{SCRIPT_VERSION} - Licensed under {SCRIPT_LICENSE}\n")
-
-parser = argparse.ArgumentParser(description='Creates project_spdx_document.spdx.yaml from vcpkg.json')
-parser.add_argument('--project_vcpkg_json', dest='project_vcpkg_json', default='vcpkg.json',
-                    help="Path to your project's vcpkg.json", required=False)
-parser.add_argument('--vcpkg_ports_dir', dest='vcpkg_ports_dir', default='../vcpkg/ports',
-                    help="Path to vcpkg official registry (port folder)", required=False)
-parser.add_argument('--vcpkg_additional_registry', dest='vcpkg_additional_registry', default='',
-                    help="Path to additional vcpkg registry (port folder)", required=False)
-parser.add_argument('--vcpkg_executable', dest='vcpkg_executable', default='..\\vcpkg\\vcpkg',
-                    help="Path to vcpkg executable", required=False)
-parser.add_argument('--project_features', dest='project_features', default='',
-                    help="Features to enable in the project", required=False)
-parser.add_argument('--dependencies_dgml', dest='dependencies_dgml', default='dependencies.dgml',
-                    help="Path to vcpkg-built dependencies.dgml", required=False)
-parser.add_argument('--mermaid', dest='mermaid', default=False, action='store_true',
-                    help="Create the mermaid diagram in addition to the DGML document through vcpkg integration")
-parser.add_argument('--dependencies_md', dest='dependencies_md', default='dependencies.md',
-                    help="Path to vcpkg-built dependencies.md with the mermaid plot, if enabled", required=False)
-parser.add_argument('--verbose', dest='verbose', default=False, action='store_true',
-                    help="Run the program in verbose mode")
-args = parser.parse_args()
-
-project_vcpkg_json = args.project_vcpkg_json
-vcpkg_ports_dir = args.vcpkg_ports_dir
-vcpkg_additional_registry = args.vcpkg_additional_registry
-vcpkg_executable = args.vcpkg_executable
-dependencies_dgml = args.dependencies_dgml
-project_features = args.project_features
-enable_mermaid = args.mermaid
-dependencies_md = args.dependencies_md
-verbose = args.verbose
-
-# Read project's vcpkg.json to get the project name
-if not os.path.exists(project_vcpkg_json):
-    print(f"Error: {project_vcpkg_json} not found")
-    exit(1)
-
-with open(project_vcpkg_json, 'r') as file:
-    project_data = json.load(file)
-project_name = project_data.get('name')
-project_license = project_data.get('license')
-project_homepage = project_data.get('homepage')
-project_version = project_data.get('version')
-project_description = project_data.get('description')
-
-if project_features is not None and project_features != '':
-    project_features = f'[{project_features}]'
-
-# Generate dependencies.dgml file
-command = f'"{vcpkg_executable}" depend-info --overlay-ports=. {project_name}{project_features} --format=dgml > {dependencies_dgml}'
-if verbose:
-    print(f"Running: {command}")
-subprocess.run(command, shell=True, check=True)
-
-if enable_mermaid:
-    command = f'"{vcpkg_executable}" depend-info --overlay-ports=. {project_name}{project_features} --format=mermaid > {dependencies_md}'
-    if verbose:
-        print(f"Running: {command}")
-    subprocess.run(command, shell=True, check=True)
+SPDX_OUTPUT_FILES = {
+    'spdx-yaml': 'project_spdx_document.spdx.yaml',
+    'spdx-json': 'project_spdx_document.spdx.json',
+}
+
+# Raised by the library functions, reported by the command line as "Error: ..."
+class LicencppError(Exception):
+    pass
+
+def parse_output_formats(formats):
+    output_formats = []
+    for output_format in ','.join(formats or ['spdx-yaml']).split(','):
+        output_format = output_format.strip()
+        if output_format not in SPDX_OUTPUT_FILES:
+            raise LicencppError(f"unknown format '{output_format}', expected one of {', '.join(SPDX_OUTPUT_FILES)}")
+        if output_format not in output_formats:
+            output_formats.append(output_format)
+    return output_formats
+
+# Read project's vcpkg.json
+def load_project(project_vcpkg_json):
+    if not os.path.exists(project_vcpkg_json):
+        raise LicencppError(f"{project_vcpkg_json} not found")
+    with open(project_vcpkg_json, 'r') as file:
+        return json.load(file)
+
+# The native resolver needs the plain feature list, vcpkg wants the name[feature,...] syntax
+def parse_features(project_features):
+    return [feature.strip() for feature in (project_features or '').split(',') if feature.strip()]
+
+def parse_triplets(triplets):
+    return list(dict.fromkeys(triplet.strip() for triplet in (triplets or '').split(',') if triplet.strip()))
+
+DGML_NAMESPACE = '{http://schemas.microsoft.com/vs/2009/dgml}'
+
+# Stream the DGML file to extract dependency names, yielding each one as soon as it is parsed.
+# If a list is given as links, the (source, target) pair of every Link is appended to it.
+def iter_dgml_nodes(dgml_source, links=None):
+    import xml.etree.ElementTree as ET
+    parents = []
+    for event, element in ET.iterparse(dgml_source, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag == DGML_NAMESPACE + 'Node':
+            yield element.get('Id')
+        elif links is not None and element.tag == DGML_NAMESPACE + 'Link':
+            links.append((element.get('Source'), element.get('Target')))
+        # Drop every element once read, so that memory stays flat whatever the size of the graph
+        element.clear()
+        if parents:
+            del parents[-1][:]
 
 # Parse the DGML file to extract dependency names
 def parse_dgml(dgml_path):
-    dependencies = []
-    tree = ET.parse(dgml_path)
-    root = tree.getroot()
-    for node in root.findall('.//{http://schemas.microsoft.com/vs/2009/dgml}Node'):
-        dependencies.append(node.get('Id'))
-    return dependencies
-
-def generate_spdx_document(dependencies_info):
+    return list(iter_dgml_nodes(dgml_path))
+
+# File-like wrapper copying everything read from a stream into another file, if one is given.
+# Reading vcpkg's output through it also lets --profile_cpu tell the time spent waiting for vcpkg.
+class TeeReader:
+    def __init__(self, source, copy=None):
+        self.source = source
+        self.copy = copy
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        if data and self.copy is not None:
+            self.copy.write(data)
+        return data
+
+def get_depend_info_target(project_name, features):
+    return f"{project_name}[{','.join(features)}]" if features else project_name
+
+# Generate the dependencies.dgml file through vcpkg
+def run_depend_info(vcpkg_executable, target, dependencies_dgml, cwd=None, verbose=False, triplet=None):
+    import subprocess
+    triplet_option = f' --triplet={triplet}' if triplet else ''
+    command = f'"{vcpkg_executable}" depend-info --overlay-ports=. {target}{triplet_option} --format=dgml > {dependencies_dgml}'
+    if verbose:
+        print(f"Running: {command}")
+    returncode = subprocess.run(command, shell=True, cwd=cwd).returncode
+    if returncode != 0:
+        raise LicencppError(f"{vcpkg_executable} depend-info failed with exit code {returncode}")
+
+# Run vcpkg depend-info without a shell and parse its DGML output while it is being produced
+def iter_depend_info_nodes(vcpkg_executable, target, dependencies_dgml=None, links=None, cwd=None, verbose=False,
+                           triplet=None):
+    import subprocess
+    import xml.etree.ElementTree as ET
+    command = [vcpkg_executable, 'depend-info', '--overlay-ports=.', target, '--format=dgml']
+    if triplet:
+        command.insert(-1, f'--triplet={triplet}')
+    if verbose:
+        print(f"Running: {' '.join(command)}")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, cwd=cwd)
+    dgml_copy = open(dependencies_dgml, 'wb') if dependencies_dgml is not None else None
+    try:
+        yield from iter_dgml_nodes(TeeReader(process.stdout, dgml_copy), links)
+    except ET.ParseError:
+        # Whatever vcpkg printed is not DGML, its exit code tells the actual story
+        if process.wait() == 0:
+            raise
+    finally:
+        process.stdout.close()
+        if dgml_copy is not None:
+            dgml_copy.close()
+        process.wait()
+    if process.returncode != 0:
+        raise LicencppError(f"{vcpkg_executable} depend-info failed with exit code {process.returncode}")
+
+# Render the dependency graph in the same mermaid flowchart syntax as 'vcpkg depend-info --format=mermaid'
+def generate_mermaid_document(nodes, links, dependencies_md):
+    lines = ["flowchart TD;"]
+    linked = set()
+    for source, target in links:
+        lines.append(f"    {source} --> {target};")
+        linked.add(source)
+        linked.add(target)
+    for node in nodes:
+        if node not in linked:
+            lines.append(f"    {node};")
+    with open(dependencies_md, "w") as mermaid_file:
+        mermaid_file.write("\n".join(lines) + "\n")
+
+# The dependency graph in compressed sparse row form: nodes are numbered in order, and the targets of node i are
+# targets[offsets[i]:offsets[i + 1]], sorted and without duplicates. Two flat arrays of 32-bit integers keep large
+# graphs compact, whatever the number of edges.
+class DependencyGraph:
+    def __init__(self, nodes, links):
+        from array import array
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        node_count = len(self.nodes)
+        sources, targets = array('I'), array('I')
+        for source, target in links:
+            source_index, target_index = self.index.get(source), self.index.get(target)
+            # Edges to nodes outside the graph and self-dependencies carry no information
+            if source_index is None or target_index is None or source_index == target_index:
+                continue
+            sources.append(source_index)
+            targets.append(target_index)
+
+        # Counting sort of the edges by source
+        row_starts = array('I', [0]) * (node_count + 1)
+        for source_index in sources:
+            row_starts[source_index + 1] += 1
+        for i in range(node_count):
+            row_starts[i + 1] += row_starts[i]
+        positions = array('I', row_starts)
+        sorted_targets = array('I', [0]) * len(targets)
+        for source_index, target_index in zip(sources, targets):
+            sorted_targets[positions[source_index]] = target_index
+            positions[source_index] += 1
+        del sources, targets, positions
+
+        self.offsets = array('I', [0])
+        self.targets = array('I')
+        for i in range(node_count):
+            self.targets.extend(sorted(set(sorted_targets[row_starts[i]:row_starts[i + 1]])))
+            self.offsets.append(len(self.targets))
+
+    # Every (source, target) edge, in node order
+    def iter_edges(self):
+        for i, source in enumerate(self.nodes):
+            for target in self.targets[self.offsets[i]:self.offsets[i + 1]]:
+                yield source, self.nodes[target]
+
+# Without a dependency graph, every package is recorded as a direct dependency of the project
+def build_spdx(project_data, dependencies_info, dependency_graph=None):
+    import datetime
+    from spdx_licenses import SPDX_LICENSE_LIST_VERSION, normalize_license_expression
+    project_name = project_data.get('name')
+    project_homepage = project_data.get('homepage')
     spdx_document = {
         "SPDXID": "SPDXRef-DOCUMENT",
         "spdxVersion": "SPDX-2.2",
         "creationInfo": {
             "created": datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
             "creators": [f"Tool: {SCRIPT_NAME}.py {SCRIPT_VERSION}", "Organization: none", "Person: Stefano Sinigardi"],
-            "licenseListVersion": "3.9"
+            "licenseListVersion": SPDX_LICENSE_LIST_VERSION
         },
         "name": f"{project_name}",
         "dataLicense": "CC0-1.0",
@@ -118,9 +229,9 @@ def generate_spdx_document(dependencies_info):
         "downloadLocation": project_homepage or "NOASSERTION",
         "homepage": project_homepage or "NOASSERTION",
         "licenseConcluded": "NOASSERTION",
-        "licenseDeclared": project_license or "NOASSERTION",
-        "description": project_description or "NOASSERTION",
-        "versionInfo": project_version or "NOASSERTION",
+        "licenseDeclared": normalize_license_expression(project_data.get('license')) or "NOASSERTION",
+        "description": project_data.get('description') or "NOASSERTION",
+        "versionInfo": project_data.get('version') or "NOASSERTION",
     }
     spdx_document["packages"].append(package)
 
@@ -134,23 +245,124 @@ def generate_spdx_document(dependencies_info):
             "downloadLocation": info['homepage'] or "NOASSERTION",
             "homepage": info['homepage'] or "NOASSERTION",
             "licenseConcluded": "NOASSERTION",
-            "licenseDeclared": info['license'] or "NOASSERTION",
+            "licenseDeclared": normalize_license_expression(info['license']) or "NOASSERTION",
             "description": info['description'] or "NOASSERTION",
             "versionInfo": info['version'] or "NOASSERTION",
         }
         spdx_document["packages"].append(package)
 
-        # Optional: Define a relationship of type 'DESCRIBES' for each package
-        relationship = {
-            "spdxElementId": "SPDXRef-Package-{}".format(project_name),
-            "relationshipType": "DEPENDS_ON",
-            "relatedSpdxElement": package_spdx_id
-        }
-        spdx_document["relationships"].append(relationship)
+        if dependency_graph is None:
+            relationship = {
+                "spdxElementId": "SPDXRef-Package-{}".format(project_name),
+                "relationshipType": "DEPENDS_ON",
+                "relatedSpdxElement": package_spdx_id
+            }
+            spdx_document["relationships"].append(relationship)
+
+    if dependency_graph is not None:
+        # One relationship per edge of the graph, between packages of the document
+        for source, target in dependency_graph.iter_edges():
+            if (source == project_name or source in dependencies_info) and target in dependencies_info and target != project_name:
+                spdx_document["relationships"].append({
+                    "spdxElementId": f"SPDXRef-Package-{source}",
+                    "relationshipType": "DEPENDS_ON",
+                    "relatedSpdxElement": f"SPDXRef-Package-{target}"
+                })
+
+    return spdx_document
 
-    with open("project_spdx_document.spdx.yaml", "w") as spdx_file:
-        yaml.dump(spdx_document, spdx_file,
+# Name of a per-triplet output: project_spdx_document.spdx.yaml becomes project_spdx_document.x64-linux.spdx.yaml
+def get_triplet_path(path, triplet):
+    if not triplet:
+        return path
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition('.')
+    return os.path.join(directory, f'{stem}.{triplet}{dot}{extension}')
+
+def write_spdx(spdx_document, output_formats, output_dir='.', triplet=None):
+    for output_format in output_formats:
+        spdx_path = os.path.join(output_dir, get_triplet_path(SPDX_OUTPUT_FILES[output_format], triplet))
+        if output_format == 'spdx-json':
+            with open(spdx_path, "w", encoding="utf-8") as spdx_file:
+                write_spdx_json(spdx_document, spdx_file)
+        else:
+            with open(spdx_path, "w") as spdx_file:
+                write_spdx_yaml(spdx_document, spdx_file)
+
+def write_spdx_json(spdx_document, spdx_file):
+    # json.dumps runs in C while json.dump goes through the pure Python encoder, so lists are streamed
+    # one item at a time with json.dumps instead of encoding the whole document into one giant string
+    spdx_file.write('{')
+    separator = '\n'
+    for key, value in spdx_document.items():
+        spdx_file.write(f'{separator}  {json.dumps(key)}: ')
+        separator = ',\n'
+        if isinstance(value, list) and value:
+            item_separator = '[\n    '
+            for item in value:
+                spdx_file.write(item_separator)
+                spdx_file.write(json.dumps(item, ensure_ascii=False))
+                item_separator = ',\n    '
+            spdx_file.write('\n  ]')
+        else:
+            spdx_file.write(json.dumps(value, ensure_ascii=False))
+    spdx_file.write('\n}\n')
+
+# Emit the YAML events of a plain dict/list/scalar tree exactly as yaml.dump's serializer would,
+# without building the intermediate node graph first
+def iter_yaml_events(value, representer, resolver):
+    import yaml
+    if isinstance(value, dict):
+        yield yaml.MappingStartEvent(None, 'tag:yaml.org,2002:map', True, flow_style=False)
+        for key, item in value.items():
+            yield from iter_yaml_events(key, representer, resolver)
+            yield from iter_yaml_events(item, representer, resolver)
+        yield yaml.MappingEndEvent()
+    elif isinstance(value, list):
+        yield yaml.SequenceStartEvent(None, 'tag:yaml.org,2002:seq', True, flow_style=False)
+        for item in value:
+            yield from iter_yaml_events(item, representer, resolver)
+        yield yaml.SequenceEndEvent()
+    else:
+        node = representer.represent_data(value)
+        implicit = (node.tag == resolver.resolve(yaml.ScalarNode, node.value, (True, False)),
+                    node.tag == resolver.resolve(yaml.ScalarNode, node.value, (False, True)))
+        yield yaml.ScalarEvent(None, node.tag, implicit, node.value, style=node.style)
+
+# libyaml folds long double-quoted scalars differently from the pure Python emitter, and double quotes are used for
+# any string with non-ASCII or control characters; strings of printable ASCII come out the same from both
+def is_printable_ascii_document(value):
+    import re
+    not_printable = re.compile('[^\x20-\x7e]').search
+    pending = [value]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, str):
+            if not_printable(value):
+                return False
+        elif isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+        elif isinstance(value, list):
+            pending.extend(value)
+    return True
+
+def write_spdx_yaml(spdx_document, spdx_file):
+    import yaml
+    # libyaml's emitter is an order of magnitude faster, but only byte-identical to the pure Python one on printable ASCII
+    if getattr(yaml, '__with_libyaml__', False) and is_printable_ascii_document(spdx_document):
+        yaml.dump(spdx_document, spdx_file, Dumper=yaml.CDumper,
                   sort_keys=False, default_flow_style=False)
+        return
+    emitter = yaml.emitter.Emitter(spdx_file)
+    representer = yaml.representer.Representer(default_flow_style=False, sort_keys=False)
+    resolver = yaml.resolver.Resolver()
+    emitter.emit(yaml.StreamStartEvent())
+    emitter.emit(yaml.DocumentStartEvent())
+    for event in iter_yaml_events(spdx_document, representer, resolver):
+        emitter.emit(event)
+    emitter.emit(yaml.DocumentEndEvent())
+    emitter.emit(yaml.StreamEndEvent())
 
 def get_version_from_dep_data(dep_data):
     # The version can be stored under one of several keys
@@ -162,36 +374,2031 @@ def get_version_from_dep_data(dep_data):
             return version
     return None
 
-def get_data_from_vcpkg_json(dep_name):
-    if verbose:
-        print(f"Analyzing {dep_name}")
-    vcpkg_json_paths = []
-    # First check the additional registry, then the official registry (so that if there's an overlay, the additional registry takes precedence)
-    if vcpkg_additional_registry != '':
-        vcpkg_json_paths.append(os.path.join(vcpkg_additional_registry, dep_name, 'vcpkg.json'))
-    vcpkg_json_paths.append(os.path.join(vcpkg_ports_dir, dep_name, 'vcpkg.json'))
-    for vcpkg_json_path in vcpkg_json_paths:
-        if os.path.exists(vcpkg_json_path):
+def get_port_metadata(dep_data):
+    description = dep_data.get('description')
+    # if description is a list of strings, we need to join them into a single string
+    if isinstance(description, list):
+        description = ' '.join(description)
+    return dep_data.get('license'), dep_data.get('homepage'), get_version_from_dep_data(dep_data), description
+
+# Persistent cache of the metadata extracted from each port's vcpkg.json, keyed by path and validated by mtime and size.
+# It also holds the port names of each registry, validated by the mtime of the ports folder.
+METADATA_CACHE_FORMAT = 2
+
+def get_default_cache_dir():
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, SCRIPT_NAME)
+
+def load_metadata_cache(cache_path):
+    try:
+        with open(cache_path, 'r') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}, {}
+    if not isinstance(cache, dict) or cache.get('format') != METADATA_CACHE_FORMAT:
+        return {}, {}
+    return cache.get('ports', {}), cache.get('registries', {})
+
+def save_metadata_cache(cache_path, ports, registries):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write to a temporary file first so that concurrent runs never see a truncated cache
+    temporary_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump({'format': METADATA_CACHE_FORMAT, 'ports': ports, 'registries': registries}, file)
+    os.replace(temporary_path, cache_path)
+
+# A git repository (bare or not, or any folder of a work tree) whose objects are read through a persistent
+# 'git cat-file --batch' process, so that any number of objects costs a single git process
+class GitRepository:
+    def __init__(self, repository, verbose=False):
+        import threading
+        self.repository = repository
+        self.verbose = verbose
+        self.process = None
+        # --jobs threads share the pipe, each request and its answer must not interleave
+        self.lock = threading.Lock()
+
+    def run_git(self, *arguments):
+        import subprocess
+        command = ['git', '-C', self.repository] + list(arguments)
+        if self.verbose:
+            print(f"Running: {' '.join(command)}")
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise LicencppError(f"git {arguments[0]} failed in {self.repository}: {result.stderr.decode(errors='replace').strip()}")
+        return result.stdout.decode('utf-8')
+
+    # Read an object given by id or as <revision>:<path>, returning (object id, content), or None if it does not exist
+    def read_object(self, object_name):
+        import subprocess
+        with self.lock:
+            if self.process is None:
+                self.process = subprocess.Popen(['git', '-C', self.repository, 'cat-file', '--batch'],
+                                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                self.process.stdin.write(f'{object_name}\n'.encode('utf-8'))
+                self.process.stdin.flush()
+            except BrokenPipeError:
+                raise LicencppError(f"git cat-file exited in {self.repository}, is it a git repository?")
+            header = self.process.stdout.readline().split()
+            # Unknown objects are answered with '<name> missing'
+            if len(header) != 3:
+                return None
+            data = self.process.stdout.read(int(header[2]))
+            # Every object is followed by a newline
+            self.process.stdout.read(1)
+        return header[0].decode('ascii'), data
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+
+    # Batch workers receive a copy of the registry, each starts its own cat-file process if it needs one
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['process'], state['lock']
+        return state
+
+    def __setstate__(self, state):
+        import threading
+        self.__dict__.update(state)
+        self.process = None
+        self.lock = threading.Lock()
+
+# Ports registry read straight from a git repository at a given revision, without a checkout.
+# The ports/<name>/vcpkg.json blob ids are listed by a single 'git ls-tree', the blobs themselves are read on demand
+# through the repository's cat-file process. Blob ids identify the content, they are used as metadata cache keys.
+class GitPortsTree:
+    def __init__(self, repository, revision, verbose=False):
+        self.repository = repository
+        self.revision = revision
+        self.git = GitRepository(repository, verbose)
+        self.commit = None
+        self.port_blobs = {}
+        self.refresh()
+
+    # Resolve the revision again (a branch may have moved) and list the ports of the new commit if it changed
+    def refresh(self):
+        commit = self.git.run_git('rev-parse', '--verify', f'{self.revision}^{{commit}}').strip()
+        if commit == self.commit:
+            return
+        port_blobs = {}
+        # --full-tree makes the paths relative to the top of the repository whatever folder of it was given
+        for entry in self.git.run_git('ls-tree', '-r', '-z', '--full-tree', commit, '--', 'ports/').split('\0'):
+            if not entry:
+                continue
+            info, path = entry.split('\t', 1)
+            object_type, object_id = info.split(' ')[1:3]
+            parts = path.split('/')
+            if object_type == 'blob' and len(parts) == 3 and parts[2] == 'vcpkg.json':
+                port_blobs[parts[1]] = object_id
+        self.commit = commit
+        self.port_blobs = port_blobs
+
+    def get_port_path(self, dep_name):
+        return f"{self.repository}@{self.commit[:12]}:ports/{dep_name}/vcpkg.json"
+
+    def read_blob(self, object_id):
+        read = self.git.read_object(object_id)
+        if read is None:
+            raise LicencppError(f"git cat-file could not read {object_id} from {self.repository}")
+        return read[1]
+
+    def close(self):
+        self.git.close()
+
+# Version numbers of the versions database are compared field by field, numerically where possible
+def get_version_sort_key(version):
+    import re
+    version_string, port_version = version
+    fields = [(0, int(field), '') if field.isdigit() else (1, 0, field) for field in re.split(r'[.+-]', str(version_string))]
+    return fields, port_version
+
+def format_version(version):
+    return f"{version[0]}#{version[1]}" if version[1] else f"{version[0]}"
+
+# 'version>=' constraints and overrides are written as "1.2.3#4", the part after '#' being the port-version
+def parse_version_constraint(constraint):
+    version_string, _, port_version = constraint.partition('#')
+    return version_string, int(port_version or 0)
+
+# The vcpkg versions database of the official registry: versions/baseline.json at each builtin-baseline commit and
+# versions/<x>-/<port>.json, read through the registry's git repository. Each file is parsed once and indexed by
+# version, so that finding the git tree of a port version is a dict lookup whatever the number of ports.
+class VersionDatabase:
+    def __init__(self, repository, revision='HEAD', verbose=False):
+        self.repository = repository
+        self.revision = revision
+        self.git = GitRepository(repository, verbose)
+        self.baselines = {}
+        self.port_versions = {}
+
+    def get_baseline(self, commit):
+        if commit not in self.baselines:
+            # Tells a missing repository or commit apart from a commit without a versions database
+            try:
+                self.git.run_git('rev-parse', '--verify', '--quiet', f'{commit}^{{commit}}')
+            except LicencppError:
+                raise LicencppError(f"builtin-baseline {commit} is not a commit of the git repository of {self.repository}")
+            read = self.git.read_object(f'{commit}:versions/baseline.json')
+            if read is None:
+                raise LicencppError(f"cannot read versions/baseline.json at builtin-baseline {commit} from {self.repository}")
+            self.baselines[commit] = json.loads(read[1]).get('default', {})
+        return self.baselines[commit]
+
+    def get_git_tree(self, port_name, version):
+        index = self.port_versions.get(port_name)
+        if index is None:
+            index = {}
+            read = self.git.read_object(f'{self.revision}:versions/{port_name[0]}-/{port_name}.json')
+            if read is not None:
+                for entry in json.loads(read[1]).get('versions', []):
+                    index[(get_version_from_dep_data(entry), entry.get('port-version', 0))] = entry['git-tree']
+            self.port_versions[port_name] = index
+        return index.get((version[0], version[1]))
+
+    def close(self):
+        self.git.close()
+
+# The port versions selected for one project, as vcpkg does in manifest mode: an override wins, otherwise the highest
+# of the builtin-baseline and of the 'version>=' constraints of the dependencies that are actually used: those of the
+# core and of the enabled features whose platform matches the triplet, in the project and in the selected port versions.
+# The native resolver records the constraints as it walks the graph; for a graph resolved by vcpkg, select() only
+# knows the nodes and counts the core and default features of each port.
+# Only the ports of the official registry are versioned, the others are read from their ports folder.
+class PortVersions:
+    def __init__(self, project_data, registry, database):
+        self.project_data = project_data
+        self.project_name = project_data.get('name')
+        self.registry = registry
+        self.database = database
+        self.baseline = database.get_baseline(project_data['builtin-baseline'])
+        self.overrides = {override['name']: (get_version_from_dep_data(override), override.get('port-version', 0))
+                          for override in project_data.get('overrides') or []}
+        self.minimum_versions = {}
+        self.git_trees = {}
+        # Set by the native resolver once the versions it walked the graph with are final
+        self.settled = False
+
+    # Record a 'version>=' constraint, returning whether it raised the version of the port.
+    # Minimum versions are never lowered, even if the port version that asked for one is replaced later.
+    def add_constraint(self, port_name, constraint):
+        version = parse_version_constraint(constraint)
+        previous = self.minimum_versions.get(port_name)
+        if previous is not None and get_version_sort_key(version) <= get_version_sort_key(previous):
+            return False
+        self.minimum_versions[port_name] = version
+        self.git_trees.pop(port_name, None)
+        return True
+
+    # Record the constraints of the core dependencies and of the given features of a manifest
+    def add_constraints(self, manifest, features, identifiers):
+        dependency_lists = [manifest.get('dependencies') or []]
+        for feature in features:
+            dependency_lists.append(get_feature_dependencies(manifest, feature) or [])
+        raised = False
+        for dependency_list in dependency_lists:
+            for dependency in dependency_list:
+                if (isinstance(dependency, dict) and dependency.get('version>=')
+                        and evaluate_platform_expression(dependency.get('platform'), identifiers)):
+                    raised |= self.add_constraint(dependency['name'], dependency['version>='])
+        return raised
+
+    def get_version(self, port_name):
+        if port_name in self.overrides:
+            return self.overrides[port_name]
+        candidates = []
+        baseline = self.baseline.get(port_name)
+        if baseline is not None:
+            candidates.append((baseline['baseline'], baseline.get('port-version', 0)))
+        if port_name in self.minimum_versions:
+            candidates.append(self.minimum_versions[port_name])
+        return max(candidates, key=get_version_sort_key) if candidates else None
+
+    # The git tree of the selected version of a port, or None for the ports read from their ports folder
+    # (the project itself, the ports of the additional registry and the ports missing from the baseline)
+    def get_git_tree(self, port_name):
+        if port_name not in self.git_trees:
+            git_tree = None
+            if port_name != self.project_name and self.registry.find_port_registry(port_name) == self.registry.vcpkg_ports_dir:
+                version = self.get_version(port_name)
+                if version is not None:
+                    git_tree = self.database.get_git_tree(port_name, version)
+                    if git_tree is None:
+                        raise LicencppError(f"version {format_version(version)} of {port_name} is not in the versions database")
+            self.git_trees[port_name] = git_tree
+        return self.git_trees[port_name]
+
+    # Settle the versions of all nodes, returning {port: git tree}. Unless the native resolver already did, the
+    # selected manifests can raise the minimum versions of other ports, so this goes on until nothing changes.
+    def select(self, nodes, features=(), triplet=None):
+        if not self.settled:
+            target_triplet, host_triplet = get_default_triplets(triplet)
+            identifiers = get_triplet_identifiers(target_triplet, host_triplet)
+            node = self.project_name
+            try:
+                project_features = [feature for feature in features if feature not in ('core', 'default')]
+                if 'core' not in features or 'default' in features:
+                    project_features += get_feature_names(self.project_data.get('default-features'), identifiers)
+                self.add_constraints(self.project_data, project_features, identifiers)
+                raised = True
+                while raised:
+                    raised = False
+                    for node in nodes:
+                        git_tree = self.get_git_tree(node)
+                        if git_tree is not None:
+                            port_data = self.registry.load_port_manifest(node, git_tree)[1]
+                            raised |= self.add_constraints(port_data, get_feature_names(port_data.get('default-features'), identifiers),
+                                                           identifiers)
+            except PlatformExpressionError as error:
+                raise LicencppError(f"invalid platform expression in {node}: {error}") from None
+        return {node: self.get_git_tree(node) for node in nodes}
+
+# Registry snapshot built by 'licencpp index build': every port of the official and additional registries in a single
+# SQLite file, with its full manifest (for the native resolver), the metadata extracted from it and a content hash,
+# tagged with the commits of the registries. Lookups go through the (registry, name) primary key.
+REGISTRY_SNAPSHOT_FORMAT = 1
+SNAPSHOT_REGISTRIES = ('additional', 'official')
+
+def build_registry_snapshot(registry, output_path):
+    import hashlib
+    import sqlite3
+    temporary_path = f'{output_path}.{os.getpid()}.tmp'
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path)
+    counts = {}
+    try:
+        connection.execute("CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute("CREATE TABLE ports (registry TEXT, name TEXT, manifest TEXT, sha256 TEXT, license TEXT, "
+                           "homepage TEXT, version TEXT, description TEXT, PRIMARY KEY (registry, name)) WITHOUT ROWID")
+        info = {'format': str(REGISTRY_SNAPSHOT_FORMAT), 'licencpp_version': SCRIPT_VERSION}
+        registry_dirs = {'official': registry.vcpkg_ports_dir, 'additional': registry.vcpkg_additional_registry}
+        for name in SNAPSHOT_REGISTRIES:
+            registry_dir = registry_dirs[name]
+            if registry_dir == '':
+                continue
+            git_tree = registry.get_git_tree(registry_dir)
+            info[f'{name}_source'] = os.path.abspath(registry_dir)
+            info[f'{name}_commit'] = git_tree.commit if git_tree is not None else get_registry_commit(registry_dir)
+            rows = []
+            for dep_name in sorted(registry.get_registry_index(registry_dir)):
+                if git_tree is not None:
+                    content = git_tree.read_blob(git_tree.port_blobs[dep_name])
+                else:
+                    try:
+                        with open(os.path.join(registry_dir, dep_name, 'vcpkg.json'), 'rb') as file:
+                            content = file.read()
+                    except FileNotFoundError:
+                        # A folder without vcpkg.json is not a port
+                        continue
+                dep_data = json.loads(content)
+                rows.append((name, dep_name, json.dumps(dep_data, separators=(',', ':')), hashlib.sha256(content).hexdigest())
+                            + get_port_metadata(dep_data))
+            connection.executemany("INSERT INTO ports VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            counts[name] = len(rows)
+        connection.executemany("INSERT INTO info VALUES (?, ?)", [(key, value) for key, value in info.items()])
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temporary_path, output_path)
+    return counts, info
+
+# The commit of the git work tree a ports folder is in, None if it is not in one
+def get_registry_commit(registry_dir):
+    try:
+        return GitRepository(registry_dir).run_git('rev-parse', 'HEAD').strip()
+    except (LicencppError, OSError):
+        return None
+
+class RegistrySnapshot:
+    def __init__(self, path):
+        if not os.path.isfile(path):
+            raise LicencppError(f"registry index {path} not found")
+        import threading
+        self.path = path
+        self.connection = None
+        # Read-only, the connection is shared by the --jobs threads under the lock
+        self.lock = threading.Lock()
+        info = dict(self.query("SELECT key, value FROM info"))
+        if info.get('format') != str(REGISTRY_SNAPSHOT_FORMAT):
+            raise LicencppError(f"{path} was built by another version of {SCRIPT_NAME}, rebuild it with '{SCRIPT_NAME} index build'")
+        self.info = info
+        # Every lookup first needs to know which registry has the port, the names are loaded at once
+        self.port_names = {name: set() for name in SNAPSHOT_REGISTRIES}
+        for registry_name, dep_name in self.query("SELECT registry, name FROM ports"):
+            self.port_names[registry_name].add(dep_name)
+
+    def query(self, sql, parameters=()):
+        import sqlite3
+        with self.lock:
+            if self.connection is None:
+                self.connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            try:
+                return self.connection.execute(sql, parameters).fetchall()
+            except sqlite3.DatabaseError as error:
+                raise LicencppError(f"cannot read registry index {self.path}: {error}")
+
+    def find_port_registry(self, dep_name):
+        for registry_name in SNAPSHOT_REGISTRIES:
+            if dep_name in self.port_names[registry_name]:
+                return registry_name
+        return None
+
+    def get_port_path(self, registry_name, dep_name):
+        commit = self.info.get(f'{registry_name}_commit')
+        return f"{self.path}:{registry_name}{'@' + commit[:12] if commit else ''}/{dep_name}/vcpkg.json"
+
+    def get_port_row(self, registry_name, dep_name, columns):
+        rows = self.query(f"SELECT {columns} FROM ports WHERE registry = ? AND name = ?", (registry_name, dep_name))
+        return rows[0] if rows else None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    # Batch workers receive a copy of the registry, each opens its own connection
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['connection'], state['lock']
+        return state
+
+    def __setstate__(self, state):
+        import threading
+        self.__dict__.update(state)
+        self.connection = None
+        self.lock = threading.Lock()
+
+# Everything known about the ports registries: the port names of each registry (built with a single scandir pass
+# per ports folder), the parsed port manifests and the persistent metadata cache.
+# One instance can be shared by any number of projects, so that each port is read at most once.
+# A registry given with a revision (vcpkg_ports_rev, vcpkg_additional_registry_rev) is a git repository whose
+# ports/ folder is read at that revision, see GitPortsTree. With a registry_index, every port comes from that
+# snapshot instead (see RegistrySnapshot) and the ports folders are not read at all.
+class PortRegistry:
+    def __init__(self, vcpkg_ports_dir, vcpkg_additional_registry='', cache_dir=None, use_cache=True, verbose=False,
+                 vcpkg_ports_rev=None, vcpkg_additional_registry_rev=None, registry_index=None):
+        self.snapshot = RegistrySnapshot(registry_index) if registry_index else None
+        self.vcpkg_ports_dir = vcpkg_ports_dir
+        self.vcpkg_additional_registry = vcpkg_additional_registry or ''
+        self.vcpkg_ports_rev = vcpkg_ports_rev
+        self.vcpkg_additional_registry_rev = vcpkg_additional_registry_rev
+        self.git_trees = {}
+        self.version_database = None
+        self.use_cache = use_cache
+        self.verbose = verbose
+        self.metadata_cache_path = os.path.join(cache_dir or get_default_cache_dir(), 'port_metadata.json')
+        if use_cache:
+            self.metadata_cache, self.registry_cache = load_metadata_cache(self.metadata_cache_path)
+        else:
+            self.metadata_cache, self.registry_cache = {}, {}
+        self.metadata_cache_dirty = False
+        self.registry_indexes = {}
+        # Registry folder of each port looked up so far, reset with the indexes, and the os.stat of the vcpkg.json
+        # found in a plain ports folder, so that each lookup stats the file once
+        self.port_registries = {}
+        self.port_stats = {}
+        # Parsed port manifests, shared by the native resolver and the metadata lookup so that each file is read once.
+        # Each entry is (path, data, generation, (path, mtime, size)); entries from an older generation are
+        # revalidated against the file before being used again.
+        self.port_manifests = {}
+        self.generation = 0
+        # Manifests of the port versions selected through the versions database, by git tree; they never change
+        self.versioned_manifests = {}
+        # Where the metadata of each port came from ('cache', 'manifest' or 'missing'), reported by --timings
+        self.lookup_sources = {}
+
+    # Long-lived users (e.g. the server) call this before each request, so that new or modified ports are picked up
+    # while unchanged ones keep their parsed manifest and cached metadata
+    def refresh(self):
+        self.registry_indexes = {}
+        self.port_registries = {}
+        self.port_stats = {}
+        self.generation += 1
+        for git_tree in self.git_trees.values():
+            git_tree.refresh()
+
+    def get_registry_revision(self, registry_dir):
+        if registry_dir == self.vcpkg_additional_registry and self.vcpkg_additional_registry_rev:
+            return self.vcpkg_additional_registry_rev
+        if registry_dir == self.vcpkg_ports_dir and self.vcpkg_ports_rev:
+            return self.vcpkg_ports_rev
+        return None
+
+    # The GitPortsTree of a registry given with a revision, None for a plain ports folder
+    def get_git_tree(self, registry_dir):
+        revision = self.get_registry_revision(registry_dir) if self.snapshot is None else None
+        if revision is None:
+            return None
+        if registry_dir not in self.git_trees:
+            self.git_trees[registry_dir] = GitPortsTree(registry_dir, revision, self.verbose)
+        return self.git_trees[registry_dir]
+
+    def close(self):
+        for git_tree in self.git_trees.values():
+            git_tree.close()
+        if self.version_database is not None:
+            self.version_database.close()
+        if self.snapshot is not None:
+            self.snapshot.close()
+
+    # The versions selected for a project with a builtin-baseline, None for a project without one
+    def get_port_versions(self, project_data):
+        if not project_data.get('builtin-baseline'):
+            return None
+        if self.snapshot is not None:
+            raise LicencppError(f"the builtin-baseline cannot be honored with the registry index {self.snapshot.path}")
+        return PortVersions(project_data, self, self.get_version_database())
+
+    def get_version_database(self):
+        if self.version_database is None:
+            self.version_database = VersionDatabase(self.vcpkg_ports_dir, self.vcpkg_ports_rev or 'HEAD', self.verbose)
+        return self.version_database
+
+    # Port names of a ports folder or git registry; a snapshot keeps its own (see RegistrySnapshot.port_names)
+    def get_registry_index(self, registry_dir):
+        if registry_dir not in self.registry_indexes:
+            git_tree = self.get_git_tree(registry_dir)
+            if git_tree is not None:
+                self.registry_indexes[registry_dir] = frozenset(git_tree.port_blobs)
+                return self.registry_indexes[registry_dir]
+            cache_key = os.path.abspath(registry_dir)
+            try:
+                # Adding or removing a port changes the mtime of the ports folder itself
+                mtime = os.stat(registry_dir).st_mtime_ns
+            except OSError:
+                self.registry_indexes[registry_dir] = frozenset()
+                return self.registry_indexes[registry_dir]
+            cached = self.registry_cache.get(cache_key)
+            if cached is not None and cached[0] == mtime:
+                port_names = frozenset(cached[1])
+            else:
+                with os.scandir(registry_dir) as entries:
+                    port_names = frozenset(entry.name for entry in entries if entry.is_dir())
+                if self.use_cache:
+                    self.registry_cache[cache_key] = [mtime, sorted(port_names)]
+                    self.metadata_cache_dirty = True
+            self.registry_indexes[registry_dir] = port_names
+        return self.registry_indexes[registry_dir]
+
+    # Builds the port indexes ahead of the first lookup, e.g. before the batch workers copy the registry.
+    # A snapshot loads its port names when it is opened, there is nothing to build.
+    def build_indexes(self):
+        if self.snapshot is not None:
+            return
+        self.get_registry_index(self.vcpkg_ports_dir)
+        if self.vcpkg_additional_registry != '':
+            self.get_registry_index(self.vcpkg_additional_registry)
+
+    def find_port_registry(self, dep_name):
+        if self.snapshot is not None:
+            return self.snapshot.find_port_registry(dep_name)
+        # First check the additional registry, then the official registry (so that if there's an overlay, the additional registry takes precedence)
+        if dep_name in self.port_registries:
+            return self.port_registries[dep_name]
+        registry_dirs = [self.vcpkg_additional_registry, self.vcpkg_ports_dir] if self.vcpkg_additional_registry != '' else [self.vcpkg_ports_dir]
+        found = None
+        for registry_dir in registry_dirs:
+            if dep_name not in self.get_registry_index(registry_dir):
+                continue
+            # The index lists every folder, a port folder without a vcpkg.json does not hide the next registry.
+            # Git registries only index ports that have one.
+            if self.get_git_tree(registry_dir) is None:
+                try:
+                    self.port_stats[dep_name] = os.stat(os.path.join(registry_dir, dep_name, 'vcpkg.json'))
+                except FileNotFoundError:
+                    continue
+            found = registry_dir
+            break
+        self.port_registries[dep_name] = found
+        return found
+
+    # The os.stat of a port's vcpkg.json taken by find_port_registry, None for a missing port or one that does not
+    # come from a plain ports folder
+    def stat_port_vcpkg_json(self, dep_name):
+        if self.find_port_registry(dep_name) is None:
+            return None
+        return self.port_stats.get(dep_name)
+
+    def find_port_vcpkg_json(self, dep_name):
+        registry_dir = self.find_port_registry(dep_name)
+        if registry_dir is None:
+            return None
+        if self.snapshot is not None:
+            return self.snapshot.get_port_path(registry_dir, dep_name)
+        git_tree = self.get_git_tree(registry_dir)
+        if git_tree is not None:
+            return git_tree.get_port_path(dep_name)
+        return os.path.join(registry_dir, dep_name, 'vcpkg.json')
+
+    # The blob id of a port's vcpkg.json if it comes from a git registry, None otherwise
+    def get_port_blob(self, dep_name):
+        registry_dir = self.find_port_registry(dep_name)
+        git_tree = self.get_git_tree(registry_dir) if registry_dir is not None else None
+        return git_tree.port_blobs[dep_name] if git_tree is not None else None
+
+    def get_versioned_port_path(self, dep_name, git_tree):
+        return f"{os.path.join(self.vcpkg_ports_dir, dep_name, 'vcpkg.json')}@{git_tree[:12]}"
+
+    # With a git tree (a port version from the versions database), the manifest is read from that tree
+    def load_port_manifest(self, dep_name, git_tree=None):
+        if git_tree is not None:
+            if git_tree not in self.versioned_manifests:
+                read = self.get_version_database().git.read_object(f'{git_tree}:vcpkg.json')
+                if read is None:
+                    raise LicencppError(f"the versions database points {dep_name} to git tree {git_tree}, which cannot be read")
+                self.versioned_manifests[git_tree] = json.loads(read[1])
+            return self.get_versioned_port_path(dep_name, git_tree), self.versioned_manifests[git_tree]
+        entry = self.port_manifests.get(dep_name)
+        if entry is not None and entry[2] == self.generation:
+            return entry[0], entry[1]
+        vcpkg_json_path = self.find_port_vcpkg_json(dep_name)
+        if self.snapshot is not None:
+            # The snapshot never changes
+            row = self.snapshot.get_port_row(self.find_port_registry(dep_name), dep_name, 'manifest') if vcpkg_json_path else None
+            data = json.loads(row[0]) if row is not None else None
+            self.port_manifests[dep_name] = (vcpkg_json_path if data is not None else None, data, self.generation, None)
+            return self.port_manifests[dep_name][:2]
+        blob = self.get_port_blob(dep_name)
+        if blob is not None:
+            # Blobs never change, the blob id is the signature
+            signature = (vcpkg_json_path, blob)
+            if entry is not None and entry[3] == signature:
+                data = entry[1]
+            else:
+                data = json.loads(self.git_trees[self.find_port_registry(dep_name)].read_blob(blob))
+            self.port_manifests[dep_name] = (vcpkg_json_path, data, self.generation, signature)
+            return vcpkg_json_path, data
+        # A folder without vcpkg.json is not a port
+        stat = self.stat_port_vcpkg_json(dep_name)
+        if stat is None:
+            self.port_manifests[dep_name] = (None, None, self.generation, None)
+            return None, None
+        signature = (vcpkg_json_path, stat.st_mtime_ns, stat.st_size)
+        if entry is not None and entry[3] == signature:
+            data = entry[1]
+        else:
             with open(vcpkg_json_path, 'r') as file:
-                dep_data = json.load(file)
-                license = dep_data.get('license')
-                homepage = dep_data.get('homepage')
-                version = get_version_from_dep_data(dep_data)
-                description = dep_data.get('description')
-                # if description is a list of strings, we need to join them into a single string
-                if isinstance(description, list):
-                    description = ' '.join(description)
-                if verbose:
-                    print(
-                        f"Using {vcpkg_json_path} as a source for {dep_name} ({version}:{license})")
+                data = json.load(file)
+        self.port_manifests[dep_name] = (vcpkg_json_path, data, self.generation, signature)
+        return vcpkg_json_path, data
+
+    def get_data_from_vcpkg_json(self, dep_name, git_tree=None):
+        if self.verbose:
+            print(f"Analyzing {dep_name}")
+        vcpkg_json_path = self.find_port_vcpkg_json(dep_name)
+        if vcpkg_json_path is None:
+            self.lookup_sources[dep_name] = 'missing'
+            return None, None, None, None
+
+        if self.snapshot is not None and git_tree is None:
+            # The metadata was extracted when the snapshot was built
+            row = self.snapshot.get_port_row(self.find_port_registry(dep_name), dep_name, 'license, homepage, version, description')
+            self.lookup_sources[dep_name] = 'snapshot'
+            if self.verbose:
+                print(f"Using {vcpkg_json_path} as a source for {dep_name}")
+            return tuple(row) if row is not None else (None, None, None, None)
+
+        blob = self.get_port_blob(dep_name) if git_tree is None else None
+        if git_tree is not None:
+            # Like blob ids, tree ids identify the content
+            vcpkg_json_path = self.get_versioned_port_path(dep_name, git_tree)
+            cache_key, validity = f'git-tree:{git_tree}', [None, None]
+        elif blob is not None:
+            # Blob ids identify the content, whatever the repository and revision it comes from
+            cache_key, validity = f'git-blob:{blob}', [None, None]
+        else:
+            cache_key = os.path.abspath(vcpkg_json_path)
+            stat = self.stat_port_vcpkg_json(dep_name)
+            if stat is None:
+                self.lookup_sources[dep_name] = 'missing'
+                return None, None, None, None
+            validity = [stat.st_mtime_ns, stat.st_size]
+        cached = self.metadata_cache.get(cache_key)
+        if cached is not None and cached[:2] == validity:
+            if self.verbose:
+                print(f"Using cached metadata of {vcpkg_json_path} for {dep_name}")
+            self.lookup_sources[dep_name] = 'cache'
+            return tuple(cached[2])
+
+        self.lookup_sources[dep_name] = 'manifest'
+        dep_data = self.load_port_manifest(dep_name, git_tree)[1]
+        if dep_data is not None:
+            license, homepage, version, description = get_port_metadata(dep_data)
+            if self.verbose:
+                print(
+                    f"Using {vcpkg_json_path} as a source for {dep_name} ({version}:{license})")
+            if self.use_cache:
+                self.metadata_cache[cache_key] = validity + [[license, homepage, version, description]]
+                self.metadata_cache_dirty = True
             return license, homepage, version, description
-    return None, None, None, None
+        return None, None, None, None
+
+    def save_cache(self):
+        if not self.metadata_cache_dirty:
+            return
+        try:
+            save_metadata_cache(self.metadata_cache_path, self.metadata_cache, self.registry_cache)
+            self.metadata_cache_dirty = False
+        except OSError as error:
+            print(f"Warning: could not write the metadata cache {self.metadata_cache_path}: {error}")
+
+# State of the previous run for --incremental: the node set and, for every port, the content hash of its vcpkg.json
+# together with the metadata extracted from it
+INCREMENTAL_STATE_FORMAT = 1
+
+class IncrementalState:
+    def __init__(self, state_path, verbose=False):
+        self.state_path = state_path
+        self.verbose = verbose
+        try:
+            with open(state_path, 'r') as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            state = {}
+        if not isinstance(state, dict) or state.get('format') != INCREMENTAL_STATE_FORMAT:
+            state = {}
+        self.previous_nodes = state.get('nodes', [])
+        self.previous_ports = state.get('ports', {})
+        self.current_ports = {}
+
+    def get_port_data(self, registry, dep_name, git_tree=None):
+        vcpkg_json_path = registry.find_port_vcpkg_json(dep_name)
+        previous = self.previous_ports.get(dep_name)
+        record = {'path': None, 'mtime': None, 'size': None, 'sha256': None}
+        blob = registry.get_port_blob(dep_name) if vcpkg_json_path is not None else None
+        if git_tree is not None and vcpkg_json_path is not None:
+            record = {'path': os.path.abspath(registry.get_versioned_port_path(dep_name, git_tree)),
+                      'mtime': None, 'size': None, 'sha256': f'git-tree:{git_tree}'}
+        elif registry.snapshot is not None and vcpkg_json_path is not None:
+            row = registry.snapshot.get_port_row(registry.find_port_registry(dep_name), dep_name, 'sha256')
+            record = {'path': vcpkg_json_path, 'mtime': None, 'size': None, 'sha256': row[0] if row else None}
+        elif blob is not None:
+            # In a git registry the blob id already tells whether the content changed
+            record = {'path': os.path.abspath(registry.find_port_registry(dep_name)) + f':ports/{dep_name}/vcpkg.json',
+                      'mtime': None, 'size': None, 'sha256': f'git-blob:{blob}'}
+        elif vcpkg_json_path is not None:
+            try:
+                # Taken when the port was looked up
+                stat = registry.stat_port_vcpkg_json(dep_name)
+                record = {'path': os.path.abspath(vcpkg_json_path), 'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+                if previous is not None and all(previous.get(key) == record[key] for key in ('path', 'mtime', 'size')):
+                    record['sha256'] = previous['sha256']
+                else:
+                    # A fresh checkout changes every mtime, the content hash tells whether the port actually changed
+                    import hashlib
+                    with open(vcpkg_json_path, 'rb') as file:
+                        record['sha256'] = hashlib.sha256(file.read()).hexdigest()
+            except FileNotFoundError:
+                record = {'path': None, 'mtime': None, 'size': None, 'sha256': None}
+
+        if previous is not None and previous['path'] == record['path'] and previous['sha256'] == record['sha256']:
+            if self.verbose:
+                print(f"Reusing the previous metadata of {dep_name}")
+            record['info'] = previous['info']
+        else:
+            record['info'] = list(registry.get_data_from_vcpkg_json(dep_name, git_tree))
+        self.current_ports[dep_name] = record
+        return tuple(record['info'])
+
+    def save(self, nodes):
+        if self.verbose:
+            previous_nodes = set(self.previous_nodes)
+            changed = sum(1 for dep in nodes if dep in self.previous_ports
+                          and self.current_ports[dep]['sha256'] != self.previous_ports[dep]['sha256'])
+            print(f"Incremental run: {len(set(nodes) - previous_nodes)} added, {len(previous_nodes - set(nodes))} removed, "
+                  f"{changed} changed out of {len(nodes)} ports")
+        try:
+            temporary_path = f'{self.state_path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'w') as file:
+                json.dump({'format': INCREMENTAL_STATE_FORMAT, 'nodes': nodes, 'ports': self.current_ports}, file)
+            os.replace(temporary_path, self.state_path)
+        except OSError as error:
+            print(f"Warning: could not write the incremental state {self.state_path}: {error}")
+
+# Native dependency resolution, mirroring what 'vcpkg depend-info' does for the default triplet
+def get_host_triplet():
+    import platform
+    machine = platform.machine().lower()
+    arch = {'amd64': 'x64', 'x86_64': 'x64', 'i386': 'x86', 'i686': 'x86',
+            'aarch64': 'arm64', 'armv7l': 'arm'}.get(machine, machine)
+    if sys.platform.startswith('win'):
+        system = 'windows'
+    elif sys.platform == 'darwin':
+        system = 'osx'
+    elif sys.platform.startswith('freebsd'):
+        system = 'freebsd'
+    elif sys.platform.startswith('openbsd'):
+        system = 'openbsd'
+    else:
+        system = 'linux'
+    return f'{arch}-{system}'
+
+# The identifiers only depend on the two triplet names, and the frozenset lets compiled platform expressions
+# be evaluated against them without copying
+@functools.lru_cache(maxsize=None)
+def get_triplet_identifiers(triplet, host_triplet):
+    # Maps a triplet name onto the identifiers usable in platform expressions
+    # https://learn.microsoft.com/en-us/vcpkg/reference/vcpkg-json#platform-expression
+    parts = triplet.split('-')
+    arch = parts[0]
+    system = parts[1] if len(parts) > 1 else ''
+    identifiers = {arch, system}
+    if arch == 'arm':
+        identifiers.add('arm32')
+    if arch in ('arm64', 'arm64ec'):
+        identifiers.add('arm')
+    if system in ('uwp', 'mingw', 'xbox'):
+        identifiers.add('windows')
+    if system == 'wasm32' or arch == 'wasm32':
+        identifiers.add('emscripten')
+    windows_like = 'windows' in identifiers
+    if 'static' in parts or (not windows_like and 'dynamic' not in parts):
+        identifiers.add('static')
+    if windows_like and 'static' in parts and 'md' not in parts:
+        identifiers.add('staticcrt')
+    if triplet == host_triplet:
+        identifiers.add('native')
+    return frozenset(identifiers)
+
+# Raised for malformed platform expressions; callers that know which manifest the expression comes from report it
+# as a LicencppError naming the port
+class PlatformExpressionError(ValueError):
+    pass
+
+def tokenize_platform_expression(expression):
+    tokens = []
+    i = 0
+    while i < len(expression):
+        char = expression[i]
+        if char.isspace():
+            i += 1
+        elif char in '!&|,()':
+            tokens.append(char)
+            i += 1
+        else:
+            start = i
+            while i < len(expression) and (expression[i].isalnum() or expression[i] in '-_'):
+                i += 1
+            if start == i:
+                raise PlatformExpressionError(f"Unexpected character '{char}' in platform expression '{expression}'")
+            tokens.append(expression[start:i])
+    return tokens
+
+def always_true(identifiers):
+    return True
+
+# Compile a platform expression into a predicate over a triplet's identifiers.
+# The same few expressions ("windows & !uwp", "!(uwp | arm)", ...) appear in thousands of port manifests, so each
+# distinct string is tokenized and parsed only once per process.
+@functools.lru_cache(maxsize=None)
+def compile_platform_expression(expression):
+    # Grammar: or := and ('|' and)* ; and := not (('&' | ',') not)* ; not := '!' not | '(' or ')' | identifier
+    if not expression:
+        return always_true
+    tokens = tokenize_platform_expression(expression)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def parse_or():
+        nonlocal position
+        operands = [parse_and()]
+        while peek() == '|':
+            position += 1
+            operands.append(parse_and())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda identifiers: any(operand(identifiers) for operand in operands)
+
+    def parse_and():
+        nonlocal position
+        operands = [parse_not()]
+        while peek() in ('&', ','):
+            position += 1
+            operands.append(parse_not())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda identifiers: all(operand(identifiers) for operand in operands)
+
+    def parse_not():
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise PlatformExpressionError(f"Unexpected end of platform expression '{expression}'")
+        position += 1
+        if token == '!':
+            operand = parse_not()
+            return lambda identifiers: not operand(identifiers)
+        if token == '(':
+            predicate = parse_or()
+            if peek() != ')':
+                raise PlatformExpressionError(f"Missing ')' in platform expression '{expression}'")
+            position += 1
+            return predicate
+        if token in '&|,)':
+            raise PlatformExpressionError(f"Unexpected '{token}' in platform expression '{expression}'")
+        return lambda identifiers: token in identifiers
+
+    predicate = parse_or()
+    if position != len(tokens):
+        raise PlatformExpressionError(f"Trailing tokens in platform expression '{expression}'")
+    return predicate
+
+def evaluate_platform_expression(expression, identifiers):
+    return compile_platform_expression(expression)(identifiers)
+
+def get_feature_names(entries, identifiers):
+    # Feature lists contain either plain names or {"name": ..., "platform": ...} objects
+    names = []
+    for entry in entries or []:
+        if isinstance(entry, str):
+            names.append(entry)
+        elif evaluate_platform_expression(entry.get('platform'), identifiers):
+            names.append(entry['name'])
+    return names
+
+def get_feature_dependencies(port_data, feature):
+    features = port_data.get('features') or {}
+    if isinstance(features, list):
+        features = {entry.get('name'): entry for entry in features}
+    feature_data = features.get(feature)
+    if feature_data is None:
+        return None
+    return feature_data.get('dependencies') or []
+
+def get_default_triplets(triplet=None):
+    host_triplet = os.environ.get('VCPKG_DEFAULT_HOST_TRIPLET') or get_host_triplet()
+    target_triplet = triplet or os.environ.get('VCPKG_DEFAULT_TRIPLET') or host_triplet
+    return target_triplet, host_triplet
+
+def resolve_dependency_graph(project_data, requested_features, registry, port_versions=None, triplet=None,
+                             verbose=False):
+    target_triplet, host_triplet = get_default_triplets(triplet)
+    # A 'version>=' found late in the walk can raise the version of a port that was already walked with an older
+    # manifest, whose dependencies may differ: the graph is then walked again with the raised minimum versions
+    stale = True
+    while stale:
+        graph, unsupported, stale = walk_dependency_graph(project_data, requested_features, registry, port_versions,
+                                                          target_triplet, host_triplet)
+    if port_versions is not None:
+        port_versions.settled = True
+
+    # A port stays in the graph when at least one of the triplets it is reached with supports it
+    pruned = {port_name for port_name, _ in unsupported} - set(graph)
+    if pruned:
+        if verbose:
+            for port_name, triplet in sorted(unsupported):
+                if port_name in pruned:
+                    print(f"Skipping {port_name}, not supported on {triplet} ('{unsupported[port_name, triplet]}')")
+        for targets in graph.values():
+            targets -= pruned
+    return graph
+
+# One walk of the dependency graph, returning (graph, {(port, triplet): supports expression} of the unsupported ports,
+# whether a version constraint raised the version of a port that had already been read)
+def walk_dependency_graph(project_data, requested_features, registry, port_versions, target_triplet, host_triplet):
+    project_name = project_data.get('name')
+    graph = {}
+    versioned_ports = set()
+    stale = False
+    enabled_features = {}
+    # Ports whose 'supports' expression rules out the triplet they are reached with are kept out of the graph,
+    # along with everything only they depend on
+    unsupported = {}
+    # vcpkg only honours 'default-features': false in the project's own manifest. Ports reached through other ports
+    # get their default features, unless the project depends on them itself, in which case its entry decides.
+    project_dependencies = set()
+    pending = [(project_name, requested_features, target_triplet)]
+    try:
+        while pending:
+            port_name, features, triplet = pending.pop()
+            identifiers = get_triplet_identifiers(triplet, host_triplet)
+            # The project itself comes from the overlay port in the current directory
+            if port_name == project_name:
+                port_data = project_data
+            elif port_versions is not None:
+                port_data = registry.load_port_manifest(port_name, port_versions.get_git_tree(port_name))[1]
+                versioned_ports.add(port_name)
+            else:
+                port_data = registry.load_port_manifest(port_name)[1]
+            if port_data is None:
+                raise LicencppError(f"port {port_name} not found in {registry.vcpkg_additional_registry or registry.vcpkg_ports_dir}")
+
+            key = (port_name, triplet)
+            if key in unsupported:
+                continue
+            if key not in enabled_features and not evaluate_platform_expression(port_data.get('supports'), identifiers):
+                if port_name == project_name:
+                    raise LicencppError(f"{project_name} does not support the triplet {triplet} ('{port_data.get('supports')}')")
+                unsupported[key] = port_data.get('supports')
+                continue
+
+            wanted = {feature for feature in features if feature not in ('core', 'default')}
+            if 'core' not in features or 'default' in features:
+                wanted.update(get_feature_names(port_data.get('default-features'), identifiers))
+            first_visit = key not in enabled_features
+            if first_visit:
+                enabled_features[key] = set()
+                graph.setdefault(port_name, set())
+            new_features = wanted - enabled_features[key]
+            enabled_features[key].update(new_features)
+
+            dependency_lists = [port_data.get('dependencies') or []] if first_visit else []
+            for feature in sorted(new_features):
+                feature_dependencies = get_feature_dependencies(port_data, feature)
+                if feature_dependencies is None:
+                    raise LicencppError(f"port {port_name} has no feature named '{feature}'")
+                dependency_lists.append(feature_dependencies)
+
+            for dependency_list in dependency_lists:
+                for dependency in dependency_list:
+                    if isinstance(dependency, str):
+                        dependency = {'name': dependency}
+                    if not evaluate_platform_expression(dependency.get('platform'), identifiers):
+                        continue
+                    if port_versions is not None and dependency.get('version>='):
+                        if port_versions.add_constraint(dependency['name'], dependency['version>=']):
+                            stale |= dependency['name'] in versioned_ports
+                    dependency_features = get_feature_names(dependency.get('features'), identifiers)
+                    dependency_triplet = host_triplet if dependency.get('host') else triplet
+                    if port_name == project_name:
+                        project_dependencies.add((dependency['name'], dependency_triplet))
+                        if dependency.get('default-features', True) is False:
+                            dependency_features.append('core')
+                    elif (dependency['name'], dependency_triplet) in project_dependencies:
+                        dependency_features.append('core')
+                    # A port may depend on its own features, which does not add an edge
+                    if dependency['name'] != port_name:
+                        graph[port_name].add(dependency['name'])
+                    pending.append((dependency['name'], dependency_features, dependency_triplet))
+    except PlatformExpressionError as error:
+        raise LicencppError(f"invalid platform expression in {port_name}: {error}") from None
+    return graph, unsupported, stale
+
+# Resolve the project's dependency graph, returning (nodes, links).
+# With the vcpkg resolver the nodes are streamed out of the DGML while it is being parsed, and links only gets filled
+# (when with_links is set) once the nodes have been consumed.
+def resolve_graph(project_data, registry, features=(), resolver='vcpkg', vcpkg_executable='vcpkg',
+                  dependencies_dgml='dependencies.dgml', pipe_dgml=False, with_links=False, cwd=None, verbose=False,
+                  port_versions=None, triplet=None):
+    project_name = project_data.get('name')
+    if resolver == 'native':
+        dependency_graph = resolve_dependency_graph(project_data, list(features), registry, port_versions, triplet, verbose)
+        # Keep the project first as vcpkg does, the rest in a stable order
+        nodes = [project_name] + sorted(name for name in dependency_graph if name != project_name)
+        links = [(dep, target) for dep in nodes for target in sorted(dependency_graph[dep])]
+        return nodes, links
+
+    links = []
+    target = get_depend_info_target(project_name, features)
+    if pipe_dgml:
+        # In pipe mode the DGML only reaches the disk when a path is given
+        dgml_copy = os.path.join(cwd or '.', dependencies_dgml) if dependencies_dgml is not None else None
+        nodes = iter_depend_info_nodes(vcpkg_executable, target, dgml_copy, links if with_links else None, cwd, verbose,
+                                       triplet)
+    else:
+        dependencies_dgml = dependencies_dgml or 'dependencies.dgml'
+        run_depend_info(vcpkg_executable, target, dependencies_dgml, cwd, verbose, triplet)
+        nodes = iter_dgml_nodes(os.path.join(cwd or '.', dependencies_dgml), links if with_links else None)
+    return nodes, links
+
+# Read the metadata of every node, returning {port: {'license', 'homepage', 'version', 'description'}} in node order.
+# If a Timings instance is given, the lookup time and metadata source of every port are recorded in it.
+# port_git_trees ({port: git tree}, see PortVersions.select) reads the selected versions instead of the ports folders.
+def load_metadata(nodes, registry, jobs=1, incremental_state=None, timings=None, port_git_trees=None):
+    git_trees = port_git_trees or {}
+    if incremental_state is not None:
+        get_port_data = lambda dep: incremental_state.get_port_data(registry, dep, git_trees.get(dep))
+    elif git_trees:
+        get_port_data = lambda dep: registry.get_data_from_vcpkg_json(dep, git_trees.get(dep))
+    else:
+        get_port_data = registry.get_data_from_vcpkg_json
+    if timings is not None:
+        get_port_data = timings.time_port_lookup(get_port_data, registry)
+    # Port lookups are dominated by file system latency, so they are fanned out over threads as soon as
+    # each node comes out of the DGML parser; collecting the results in submission order keeps the output deterministic
+    if jobs > 1:
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            lookups = [(dep, executor.submit(get_port_data, dep)) for dep in nodes]
+            ports_data = [(dep, lookup.result()) for dep, lookup in lookups]
+    else:
+        ports_data = [(dep, get_port_data(dep)) for dep in nodes]
+
+    dependencies_info = {}
+    for dep, (license, homepage, version, description) in ports_data:
+        dependencies_info[dep] = {'license': license, 'homepage': homepage, 'version': version, 'description': description}
+    return dependencies_info
+
+# The versions selected for a project with a builtin-baseline (see PortVersions), or None. If the versions database
+# cannot be read (e.g. the ports folder is not in a git clone of vcpkg), the ports are read as they are.
+def get_project_port_versions(project_data, registry):
+    try:
+        return registry.get_port_versions(project_data)
+    except LicencppError as error:
+        print(f"Warning: {error}, the ports are read without the versions database")
+        return None
+
+# Wall time of each stage of a run, plus the lookup time and metadata source of each port, reported by --timings
+class Timings:
+    def __init__(self):
+        self.stages = {}
+        self.ports = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def stage(self, stage):
+        return TimedStage(self, stage)
+
+    # Yield the items of iterable, counting the time spent producing them (e.g. parsing the DGML) in stage
+    def iter_timed(self, iterable, stage):
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def time_port_lookup(self, get_port_data, registry):
+        def timed_get_port_data(dep):
+            registry.lookup_sources.pop(dep, None)
+            start = time.perf_counter()
+            port_data = get_port_data(dep)
+            # Ports that --incremental reused never reach the registry
+            self.ports[dep] = (time.perf_counter() - start, registry.lookup_sources.get(dep, 'incremental state'))
+            return port_data
+        return timed_get_port_data
+
+    def get_source_counts(self):
+        counts = {}
+        for _, source in self.ports.values():
+            counts[source] = counts.get(source, 0) + 1
+        return counts
+
+    def get_slowest_ports(self, count):
+        return sorted(self.ports.items(), key=lambda item: item[1][0], reverse=True)[:count]
+
+    def print_report(self, slowest_count):
+        width = max([len(stage) for stage in self.stages] + [5])
+        print("Timings:")
+        for stage, seconds in self.stages.items():
+            print(f"  {stage:<{width}}  {seconds:8.3f} s")
+        print(f"  {'total':<{width}}  {sum(self.stages.values()):8.3f} s")
+        counts = self.get_source_counts()
+        print(f"Metadata cache: {counts.get('cache', 0)} hits, {counts.get('manifest', 0)} misses"
+              + (f", {counts['incremental state']} reused from the incremental state" if 'incremental state' in counts else '')
+              + (f", {counts['snapshot']} read from the registry index" if 'snapshot' in counts else '')
+              + (f", {counts['missing']} not in the registries" if 'missing' in counts else ''))
+        if self.ports:
+            print("Slowest port lookups:")
+            for dep, (seconds, source) in self.get_slowest_ports(slowest_count):
+                print(f"  {dep:<{width}}  {seconds * 1000:8.3f} ms ({source})")
+
+    def write_json(self, path, slowest_count):
+        counts = self.get_source_counts()
+        report = {
+            'stages': self.stages,
+            'total': sum(self.stages.values()),
+            'cache': {'hits': counts.get('cache', 0), 'misses': counts.get('manifest', 0),
+                      'incremental': counts.get('incremental state', 0), 'snapshot': counts.get('snapshot', 0),
+                      'missing': counts.get('missing', 0)},
+            'slowest_ports': [{'name': dep, 'seconds': seconds, 'source': source}
+                              for dep, (seconds, source) in self.get_slowest_ports(slowest_count)],
+            'ports': {dep: {'seconds': seconds, 'source': source} for dep, (seconds, source) in self.ports.items()},
+        }
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+
+# Stands in for a TimedStage when nothing is being timed
+class NoTiming:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+NO_TIMING = NoTiming()
+
+class TimedStage:
+    def __init__(self, timings, stage):
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.stage, time.perf_counter() - self.start)
+
+# --profile_cpu: cProfile statistics of the whole run, dumped in pstats format
+class CpuProfile:
+    def __init__(self, path):
+        import cProfile
+        self.path = path
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        import pstats
+        self.profiler.disable()
+        self.profiler.dump_stats(self.path)
+        stats = pstats.Stats(self.profiler).stats
+        total = sum(entry[2] for entry in stats.values())
+        # Waiting for vcpkg depend-info is not licencpp's own work, it is reported apart
+        wait_functions = [run_depend_info.__code__, TeeReader.read.__code__]
+        vcpkg_wait = sum(stats[key][3] for key in ((code.co_filename, code.co_firstlineno, code.co_name)
+                                                  for code in wait_functions) if key in stats)
+        print(f"CPU profile written to {self.path}: {total:.3f} s profiled, {vcpkg_wait:.3f} s of which "
+              f"waiting for vcpkg depend-info, {total - vcpkg_wait:.3f} s in licencpp")
+
+# --profile_mem: tracemalloc statistics of the allocation sites still alive at the run's largest checkpoint
+class MemoryProfile:
+    def __init__(self, path, frames=10, top=30):
+        self.path = path
+        self.frames = frames
+        self.top = top
+        self.snapshot = None
+        self.snapshot_size = 0
+        self.snapshot_label = None
+
+    def start(self):
+        import tracemalloc
+        tracemalloc.start(self.frames)
+
+    # Called between the stages of a run, keeps the snapshot taken when the most memory was in use
+    def checkpoint(self, label):
+        import tracemalloc
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.snapshot_size:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current
+            self.snapshot_label = label
+
+    def stop(self):
+        import tracemalloc
+        if self.snapshot is None:
+            self.checkpoint('end of run')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        snapshot = self.snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '*/cProfile.py'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ])
+        with open(self.path, 'w') as file:
+            file.write(f"Peak traced memory: {peak / 2**20:.1f} MiB\n")
+            file.write(f"Largest checkpoint: {self.snapshot_size / 2**20:.1f} MiB, after {self.snapshot_label}\n\n")
+            file.write(f"Top {self.top} allocation sites:\n")
+            for statistic in snapshot.statistics('lineno')[:self.top]:
+                file.write(f"  {statistic}\n")
+            file.write(f"\nTop {self.top} allocation tracebacks:\n")
+            for statistic in snapshot.statistics('traceback')[:self.top]:
+                file.write(f"\n{statistic.count} blocks, {statistic.size / 1024:.1f} KiB\n")
+                for line in statistic.traceback.format():
+                    file.write(f"{line}\n")
+        print(f"Memory profile written to {self.path}: peak {peak / 2**20:.1f} MiB")
+
+# Set by run() when --profile_mem is given, the pipeline stages report their checkpoints to it
+memory_profile = None
+
+def memory_checkpoint(label):
+    if memory_profile is not None:
+        memory_profile.checkpoint(label)
+
+# Batch mode: each worker process gets a copy of the parent's registry, with its port indexes already built
+batch_registry = None
+
+def init_batch_worker(registry):
+    global batch_registry
+    batch_registry = registry
+
+def resolve_batch_project(manifest, resolve_options):
+    resolve_options = dict(resolve_options)
+    use_baseline = resolve_options.pop('use_baseline', True)
+    project_data = load_project(manifest)
+    port_versions = get_project_port_versions(project_data, batch_registry) if use_baseline else None
+    nodes, links = resolve_graph(project_data, batch_registry, cwd=os.path.dirname(manifest) or '.',
+                                 port_versions=port_versions, **resolve_options)
+    nodes = list(nodes)
+    if port_versions is None:
+        return project_data, nodes, links, {}
+    return project_data, nodes, links, port_versions.select(nodes, resolve_options.get('features', ()),
+                                                            resolve_options.get('triplet'))
+
+def write_batch_project(project_data, dependencies_info, links, output_dir, output_formats, dependencies_md=None):
+    if dependencies_md is not None:
+        generate_mermaid_document(list(dependencies_info), links, os.path.join(output_dir, dependencies_md))
+    dependency_graph = DependencyGraph(dependencies_info, links)
+    write_spdx(build_spdx(project_data, dependencies_info, dependency_graph), output_formats, output_dir)
+
+def expand_manifests(patterns):
+    import glob
+    manifests = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for manifest in matches:
+            if os.path.isdir(manifest):
+                manifest = os.path.join(manifest, 'vcpkg.json')
+            if manifest not in manifests:
+                manifests.append(manifest)
+    return manifests
+
+# Generate one SPDX document per manifest, next to it. Graphs are resolved on a process pool, then the metadata of the
+# union of all their ports is read once, so the total cost follows the number of unique ports rather than
+# projects x ports. Returns {manifest: error message} for the projects that failed.
+def run_batch(manifests, registry, output_formats, resolve_options, processes=None, jobs=1, dependencies_md=None):
+    # multiprocessing.Pool rather than ProcessPoolExecutor, whose initializer needs Python 3.7
+    import multiprocessing
+    # Build the port indexes once here, the workers inherit them
+    registry.build_indexes()
+
+    failures = {}
+    projects = {}
+    with multiprocessing.Pool(processes, initializer=init_batch_worker, initargs=(registry,)) as pool:
+        resolutions = [(manifest, pool.apply_async(resolve_batch_project, (manifest, resolve_options))) for manifest in manifests]
+        for manifest, resolution in resolutions:
+            try:
+                projects[manifest] = resolution.get()
+            except (LicencppError, OSError, ValueError) as error:
+                failures[manifest] = str(error)
+
+        unique_ports = list(dict.fromkeys((node, git_trees.get(node)) for _, nodes, _, git_trees in projects.values()
+                                          for node in nodes))
+        if registry.verbose:
+            print(f"{len(projects)} projects use {len(unique_ports)} unique ports")
+        # A port selected at different versions by different projects is read once per version:
+        # each layer holds every port at most once
+        layers = []
+        for node, git_tree in unique_ports:
+            for layer in layers:
+                if node not in layer:
+                    layer[node] = git_tree
+                    break
+            else:
+                layers.append({node: git_tree})
+        ports_info = {}
+        for layer in layers:
+            for node, info in load_metadata(list(layer), registry, jobs, port_git_trees=layer).items():
+                ports_info[(node, layer[node])] = info
+
+        writes = []
+        for manifest, (project_data, nodes, links, git_trees) in projects.items():
+            dependencies_info = {node: ports_info[(node, git_trees.get(node))] for node in nodes}
+            writes.append((manifest, pool.apply_async(write_batch_project, (project_data, dependencies_info, links,
+                                                                            os.path.dirname(manifest) or '.',
+                                                                            output_formats, dependencies_md))))
+        for manifest, write in writes:
+            try:
+                write.get()
+            except OSError as error:
+                failures[manifest] = str(error)
+    registry.save_cache()
+    return failures
+
+# Server mode: a long-lived process keeps the registry indexes, parsed manifests and port metadata in memory
+# and answers SBOM requests over localhost HTTP or a Unix socket:
+#   POST /sbom {"manifest": "/path/to/vcpkg.json", "features": "a,b", "format": "spdx-json", "resolver": "native",
+#               "triplet": "x64-windows"}
+# returns the SPDX document in the requested format; GET /health answers "ok".
+class SbomService:
+    def __init__(self, registry, resolver, vcpkg_executable, jobs, verbose):
+        import threading
+        self.registry = registry
+        self.resolver = resolver
+        self.vcpkg_executable = vcpkg_executable
+        self.jobs = jobs
+        self.verbose = verbose
+        # Requests share the registry, refreshing it while another one reads it would be unsafe
+        self.lock = threading.Lock()
+
+    def generate(self, manifest, features, resolver=None, triplet=None):
+        with self.lock:
+            self.registry.refresh()
+            project_data = load_project(manifest)
+            port_versions = get_project_port_versions(project_data, self.registry)
+            nodes, links = resolve_graph(project_data, self.registry, features, resolver or self.resolver,
+                                         self.vcpkg_executable, None, pipe_dgml=True,
+                                         with_links=True, cwd=os.path.dirname(manifest) or '.', verbose=self.verbose,
+                                         port_versions=port_versions, triplet=triplet)
+            port_git_trees = None
+            if port_versions is not None:
+                nodes = list(nodes)
+                port_git_trees = port_versions.select(nodes, features, triplet)
+            dependencies_info = load_metadata(nodes, self.registry, self.jobs, port_git_trees=port_git_trees)
+            self.registry.save_cache()
+        return build_spdx(project_data, dependencies_info, DependencyGraph(dependencies_info, links))
+
+    def handle_request(self, body):
+        # Returns (status, content type, text)
+        try:
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict) or not request.get('manifest') or not isinstance(request['manifest'], str):
+                raise LicencppError("the request must be a JSON object with a 'manifest' path")
+            if not isinstance(request.get('format') or '', str):
+                raise LicencppError("'format' must be a string")
+            output_format = parse_output_formats([request.get('format') or 'spdx-yaml'])
+            if len(output_format) != 1:
+                raise LicencppError("exactly one format must be requested")
+            features = request.get('features') or []
+            if isinstance(features, str):
+                features = parse_features(features)
+            if not isinstance(features, list) or not all(isinstance(feature, str) for feature in features):
+                raise LicencppError("'features' must be a list of strings or a comma separated string")
+            resolver = request.get('resolver')
+            if resolver not in (None, 'vcpkg', 'native'):
+                raise LicencppError("'resolver' must be 'vcpkg' or 'native'")
+            triplet = request.get('triplet')
+            if triplet is not None and not isinstance(triplet, str):
+                raise LicencppError("'triplet' must be a string")
+            document = self.generate(request['manifest'], features, resolver, triplet)
+            output = io.StringIO()
+            if output_format[0] == 'spdx-json':
+                write_spdx_json(document, output)
+                return 200, 'application/json', output.getvalue()
+            write_spdx_yaml(document, output)
+            return 200, 'application/yaml', output.getvalue()
+        except (LicencppError, ValueError, OSError) as error:
+            return 400, 'application/json', json.dumps({'error': str(error)}) + '\n'
+        except Exception as error:
+            # A bug must not leave the client without a response
+            import traceback
+            traceback.print_exc()
+            return 500, 'application/json', json.dumps({'error': f"internal error: {error}"}) + '\n'
+
+# The HTTP machinery is only imported when the server actually starts
+def create_sbom_server(service, host, port, socket_path=None):
+    import http.server
+    import socketserver
+
+    class SbomRequestHandler(http.server.BaseHTTPRequestHandler):
+        server_version = f"{SCRIPT_NAME}/{SCRIPT_VERSION}"
+
+        def do_GET(self):
+            if self.path == '/health':
+                self.send_text(200, 'text/plain', 'ok\n')
+            else:
+                self.send_text(404, 'application/json', json.dumps({'error': f"unknown path {self.path}"}) + '\n')
+
+        def do_POST(self):
+            if self.path != '/sbom':
+                self.send_text(404, 'application/json', json.dumps({'error': f"unknown path {self.path}"}) + '\n')
+                return
+            # Without a valid length the body cannot be read, and a negative one would block until the client closes
+            length = self.headers.get('Content-Length')
+            if length is None:
+                self.send_text(411, 'application/json', json.dumps({'error': "a Content-Length is required"}) + '\n')
+                return
+            if not length.strip().isdigit():
+                self.send_text(400, 'application/json', json.dumps({'error': f"invalid Content-Length '{length}'"}) + '\n')
+                return
+            body = self.rfile.read(int(length))
+            self.send_text(*service.handle_request(body))
+
+        def send_text(self, status, content_type, text):
+            body = text.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def address_string(self):
+            # Unix socket clients have no address
+            return self.client_address[0] if self.client_address else 'unix'
+
+        def log_message(self, format, *args):
+            if service.verbose:
+                super().log_message(format, *args)
+
+    if socket_path:
+        if not hasattr(socketserver, 'UnixStreamServer'):
+            raise LicencppError("Unix sockets are not available on this platform, use --port instead")
+
+        class SbomUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return SbomUnixServer(socket_path, SbomRequestHandler), socket_path
+
+    class SbomHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+        daemon_threads = True
+
+    server = SbomHTTPServer((host, port), SbomRequestHandler)
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def serve(registry, host='127.0.0.1', port=8765, socket_path=None, resolver='native', vcpkg_executable='vcpkg',
+          jobs=1, verbose=False):
+    service = SbomService(registry, resolver, vcpkg_executable, jobs, verbose)
+    server, where = create_sbom_server(service, host, port, socket_path)
+    # Warm the port indexes before the first request
+    registry.build_indexes()
+    print(f"Serving SBOM requests on {where}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        registry.save_cache()
+        registry.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+# Watch mode: the files that can change the SBOM are the project manifest (and the overlay port folder it lives in),
+# the ports folders themselves (ports added or removed) and the vcpkg.json of every port in the current graph
+def get_watched_paths(project_vcpkg_json, registry, nodes):
+    paths = [project_vcpkg_json, registry.vcpkg_ports_dir]
+    if registry.vcpkg_additional_registry != '':
+        paths.append(registry.vcpkg_additional_registry)
+    for node in nodes:
+        # Ports read from a git registry have no file to watch
+        vcpkg_json_path = registry.find_port_vcpkg_json(node)
+        if vcpkg_json_path is not None and registry.snapshot is None and registry.get_port_blob(node) is None:
+            paths.append(vcpkg_json_path)
+    return paths
+
+# Minimal inotify binding through ctypes: directories are watched, and only events about vcpkg.json files
+# (or the given manifest names) and about port folders being added or removed count as changes.
+# Directories that cannot be watched (e.g. once fs.inotify.max_user_watches is used up) are polled instead.
+class InotifyWatcher:
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, manifest_names, interval):
+        import ctypes
+        import ctypes.util
+        import struct
+        self.event_header = struct.Struct('iIII')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.manifest_names = set(manifest_names) | {'vcpkg.json'}
+        self.watches = {}
+        # Watch descriptors of the folders given as such (the registries), where port folders coming and going count
+        self.folder_descriptors = set()
+        self.polling = PollingWatcher(interval)
+        self.unwatched = set()
+
+    def set_paths(self, paths):
+        import ctypes
+        folders = {os.path.abspath(path) for path in paths if os.path.isdir(path)}
+        directories = folders | {os.path.abspath(os.path.dirname(path) or '.') for path in paths if not os.path.isdir(path)}
+        mask = (self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                | self.IN_CREATE | self.IN_DELETE)
+        for directory, descriptor in list(self.watches.items()):
+            if directory not in directories:
+                self.libc.inotify_rm_watch(self.fd, descriptor)
+                del self.watches[directory]
+        unwatched, error = set(), None
+        for directory in directories - set(self.watches):
+            descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if descriptor >= 0:
+                self.watches[directory] = descriptor
+            else:
+                unwatched.add(directory)
+                error = os.strerror(ctypes.get_errno())
+        if unwatched and unwatched != self.unwatched:
+            print(f"Warning: inotify cannot watch {len(unwatched)} folders ({error}), "
+                  f"polling them every {self.polling.interval} s instead", flush=True)
+        self.unwatched = unwatched
+        self.folder_descriptors = {self.watches[folder] for folder in folders if folder in self.watches}
+        self.polling.set_paths([path for path in paths
+                                if os.path.abspath(path if os.path.isdir(path) else os.path.dirname(path) or '.') in unwatched])
+
+    def wait(self, timeout):
+        import select
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self.polling.signatures:
+                remaining = self.polling.interval if remaining is None else min(remaining, self.polling.interval)
+            if select.select([self.fd], [], [], remaining)[0]:
+                if self.is_relevant(os.read(self.fd, 65536)):
+                    return True
+            elif self.polling.wait(0):
+                return True
+            elif deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def is_relevant(self, buffer):
+        offset = 0
+        while offset + self.event_header.size <= len(buffer):
+            descriptor, mask, _, length = self.event_header.unpack_from(buffer, offset)
+            name = buffer[offset + self.event_header.size:offset + self.event_header.size + length].rstrip(b'\0')
+            offset += self.event_header.size + length
+            # A folder created next to the project manifest (e.g. a build folder) is not a new port
+            if (mask & self.IN_ISDIR and descriptor in self.folder_descriptors) or os.fsdecode(name) in self.manifest_names:
+                return True
+        return False
+
+    def close(self):
+        os.close(self.fd)
+
+# Fallback for systems without inotify: the watched paths are polled for mtime and size changes
+class PollingWatcher:
+    def __init__(self, interval):
+        self.interval = interval
+        self.signatures = {}
+
+    @staticmethod
+    def get_signature(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def set_paths(self, paths):
+        self.signatures = {path: self.get_signature(path) for path in paths}
+
+    def wait(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = False
+            for path, signature in self.signatures.items():
+                current = self.get_signature(path)
+                if current != signature:
+                    self.signatures[path] = current
+                    changed = True
+            if changed:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+def create_watcher(interval, manifest_names):
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(manifest_names, interval)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(interval)
+
+def add_registry_arguments(parser):
+    parser.add_argument('--vcpkg_ports_dir', dest='vcpkg_ports_dir', default='../vcpkg/ports',
+                        help="Path to vcpkg official registry (port folder)", required=False)
+    parser.add_argument('--vcpkg_additional_registry', dest='vcpkg_additional_registry', default='',
+                        help="Path to additional vcpkg registry (port folder)", required=False)
+    parser.add_argument('--vcpkg_ports_rev', dest='vcpkg_ports_rev', default=None,
+                        help="Read the official registry from the ports/ folder of the git repository containing --vcpkg_ports_dir at this revision, instead of the checkout", required=False)
+    parser.add_argument('--vcpkg_additional_registry_rev', dest='vcpkg_additional_registry_rev', default=None,
+                        help="Treat --vcpkg_additional_registry as a git repository (bare or not) and read its ports/ folder at this revision", required=False)
+    parser.add_argument('--vcpkg_executable', dest='vcpkg_executable', default='..\\vcpkg\\vcpkg',
+                        help="Path to vcpkg executable", required=False)
+    parser.add_argument('--cache_dir', dest='cache_dir', default=None,
+                        help="Folder for the persistent port metadata cache (defaults to the user cache folder)", required=False)
+    parser.add_argument('--no_cache', dest='no_cache', default=False, action='store_true',
+                        help="Do not read or write the persistent port metadata cache")
+    parser.add_argument('--jobs', dest='jobs', default=1, type=int,
+                        help="Number of threads used to read the ports metadata", required=False)
+
+def add_registry_index_argument(parser):
+    parser.add_argument('--registry_index', dest='registry_index', default=None,
+                        help=f"Read every port from this snapshot built by '{SCRIPT_NAME} index build' instead of the registries", required=False)
+
+def create_index_argument_parser():
+    import argparse
+    parser = argparse.ArgumentParser(prog=f'{SCRIPT_NAME} index', description='Manages registry snapshots')
+    subparsers = parser.add_subparsers(dest='index_command', metavar='command')
+    subparsers.required = True
+    build_parser = subparsers.add_parser('build', description='Compiles the official and additional registries into a single snapshot file',
+                                         help="Compile the registries into a snapshot for --registry_index")
+    add_registry_arguments(build_parser)
+    build_parser.add_argument('--output', dest='output', default='licencpp_registry.sqlite',
+                              help="Path of the snapshot to write", required=False)
+    build_parser.add_argument('--verbose', dest='verbose', default=False, action='store_true',
+                              help="Run the program in verbose mode")
+    return parser
+
+def create_serve_argument_parser():
+    import argparse
+    parser = argparse.ArgumentParser(prog=f'{SCRIPT_NAME} serve',
+                                     description='Keeps the registry state in memory and serves SBOM requests')
+    add_registry_arguments(parser)
+    add_registry_index_argument(parser)
+    parser.add_argument('--resolver', dest='resolver', default='native', choices=['vcpkg', 'native'],
+                        help="Default resolver for requests that do not choose one", required=False)
+    parser.add_argument('--host', dest='host', default='127.0.0.1',
+                        help="Address to listen on", required=False)
+    parser.add_argument('--port', dest='port', default=8765, type=int,
+                        help="TCP port to listen on", required=False)
+    parser.add_argument('--socket', dest='socket', default=None,
+                        help="Listen on this Unix socket instead of TCP", required=False)
+    parser.add_argument('--verbose', dest='verbose', default=False, action='store_true',
+                        help="Run the program in verbose mode")
+    return parser
+
+def create_argument_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description='Creates project_spdx_document.spdx.yaml from vcpkg.json')
+    parser.add_argument('--project_vcpkg_json', dest='project_vcpkg_json', default='vcpkg.json',
+                        help="Path to your project's vcpkg.json", required=False)
+    add_registry_arguments(parser)
+    add_registry_index_argument(parser)
+    parser.add_argument('--project_features', dest='project_features', default='',
+                        help="Features to enable in the project", required=False)
+    parser.add_argument('--dependencies_dgml', dest='dependencies_dgml', default=None,
+                        help="Path to vcpkg-built dependencies.dgml (default: dependencies.dgml)", required=False)
+    parser.add_argument('--pipe_dgml', dest='pipe_dgml', default=False, action='store_true',
+                        help="Parse the output of vcpkg depend-info through a pipe, writing the DGML only if --dependencies_dgml is given")
+    parser.add_argument('--mermaid', dest='mermaid', default=False, action='store_true',
+                        help="Create the mermaid diagram of the dependency graph in addition to the SPDX document")
+    parser.add_argument('--dependencies_md', dest='dependencies_md', default='dependencies.md',
+                        help="Path to dependencies.md with the mermaid plot, if enabled", required=False)
+    parser.add_argument('--resolver', dest='resolver', default='vcpkg', choices=['vcpkg', 'native'],
+                        help="Resolve the dependency graph through 'vcpkg depend-info' or natively from the ports folders", required=False)
+    parser.add_argument('--triplet', dest='triplet', default=None,
+                        help="Target triplet, e.g. x64-windows (default: VCPKG_DEFAULT_TRIPLET or the host triplet)", required=False)
+    parser.add_argument('--triplets', dest='triplets', default=None,
+                        help="Comma separated target triplets, one SPDX document is written per triplet "
+                             "(e.g. project_spdx_document.x64-windows.spdx.yaml)", required=False)
+    parser.add_argument('--ignore_baseline', dest='ignore_baseline', default=False, action='store_true',
+                        help="Read every port from the ports folders, even if the project has a builtin-baseline")
+    parser.add_argument('--format', dest='formats', action='append', default=None,
+                        help="Output format, spdx-yaml (default) or spdx-json; repeat or separate with commas for several", required=False)
+    parser.add_argument('--incremental', dest='incremental', default=False, action='store_true',
+                        help="Only re-read the ports whose vcpkg.json changed since the previous run, as recorded in --state_file")
+    parser.add_argument('--state_file', dest='state_file', default='.licencpp_state.json',
+                        help="Path to the state file used by --incremental", required=False)
+    parser.add_argument('--watch', dest='watch', default=False, action='store_true',
+                        help="Keep running and regenerate the SBOM whenever the project manifest, the overlay or the registries change")
+    parser.add_argument('--watch_debounce', dest='watch_debounce', default=0.5, type=float,
+                        help="Seconds without changes to wait for before regenerating in --watch mode", required=False)
+    parser.add_argument('--watch_interval', dest='watch_interval', default=1.0, type=float,
+                        help="Polling interval in seconds, when inotify is not available or cannot watch a folder", required=False)
+    parser.add_argument('--timings', dest='timings', default=False, action='store_true',
+                        help="Print how long each stage took, the metadata cache hits and misses and the slowest ports")
+    parser.add_argument('--timings_json', dest='timings_json', default=None,
+                        help="Write the --timings breakdown, including the lookup time of every port, to this JSON file", required=False)
+    parser.add_argument('--timings_top', dest='timings_top', default=10, type=int,
+                        help="Number of slowest ports reported by --timings", required=False)
+    parser.add_argument('--profile_cpu', '--profile-cpu', dest='profile_cpu', default=None,
+                        help="Profile the run with cProfile and write the statistics to this file in pstats format "
+                             "(threads started by --jobs are not profiled)", required=False)
+    parser.add_argument('--profile_mem', '--profile-mem', dest='profile_mem', default=None,
+                        help="Trace the run's allocations with tracemalloc and write the top allocation sites to this file", required=False)
+    parser.add_argument('--batch', dest='batch', action='append', default=None,
+                        help="Process several vcpkg.json manifests (paths or glob patterns, repeatable) and write one SPDX document next to each", required=False)
+    parser.add_argument('--batch_processes', dest='batch_processes', default=None, type=int,
+                        help="Number of worker processes used by --batch (default: number of CPUs)", required=False)
+    parser.add_argument('--verbose', dest='verbose', default=False, action='store_true',
+                        help="Run the program in verbose mode")
+    return parser
+
+def run(args):
+    global memory_profile
+    profiles = []
+    if args.profile_mem:
+        memory_profile = MemoryProfile(args.profile_mem)
+        profiles.append(memory_profile)
+    if args.profile_cpu:
+        profiles.append(CpuProfile(args.profile_cpu))
+    for profile in profiles:
+        profile.start()
+    try:
+        output_formats = parse_output_formats(args.formats)
+        registry = PortRegistry(args.vcpkg_ports_dir, args.vcpkg_additional_registry,
+                                cache_dir=args.cache_dir, use_cache=not args.no_cache, verbose=args.verbose,
+                                vcpkg_ports_rev=args.vcpkg_ports_rev,
+                                vcpkg_additional_registry_rev=args.vcpkg_additional_registry_rev,
+                                registry_index=args.registry_index)
+        try:
+            if args.batch:
+                run_batch_command(args, registry, output_formats)
+            elif args.watch:
+                run_watch_command(args, registry, output_formats)
+            else:
+                generate_project(args, registry, output_formats)
+        finally:
+            registry.close()
+    finally:
+        for profile in reversed(profiles):
+            profile.stop()
+        memory_profile = None
+
+def generate_project(args, registry, output_formats):
+    if args.triplets:
+        return generate_triplet_projects(args, registry, output_formats)
+    timings = Timings() if args.timings or args.timings_json else None
+    stage = timings.stage if timings is not None else lambda name: NO_TIMING
+
+    with stage('load project'):
+        project_data = load_project(args.project_vcpkg_json)
+        incremental_state = IncrementalState(args.state_file, args.verbose) if args.incremental else None
+        port_versions = get_project_port_versions(project_data, registry) if not args.ignore_baseline else None
+
+    # Without --pipe_dgml the DGML always goes through dependencies.dgml, with it only if asked for
+    dependencies_dgml = args.dependencies_dgml if args.pipe_dgml else (args.dependencies_dgml or 'dependencies.dgml')
+    if args.resolver == 'native':
+        resolve_stage, parse_stage = 'native resolution', None
+    elif args.pipe_dgml:
+        # vcpkg writes the DGML while it is being parsed, the two cannot be told apart
+        resolve_stage, parse_stage = 'vcpkg depend-info + DGML parsing', 'vcpkg depend-info + DGML parsing'
+    else:
+        resolve_stage, parse_stage = 'vcpkg depend-info', 'DGML parsing'
+    with stage(resolve_stage):
+        nodes, links = resolve_graph(project_data, registry, parse_features(args.project_features), args.resolver,
+                                     args.vcpkg_executable, dependencies_dgml, args.pipe_dgml,
+                                     with_links=True, verbose=args.verbose, port_versions=port_versions,
+                                     triplet=args.triplet)
+    port_git_trees = None
+    if port_versions is not None:
+        # Selecting the versions needs every node
+        with stage(parse_stage or resolve_stage):
+            nodes = list(nodes)
+        with stage('version selection'):
+            port_git_trees = port_versions.select(nodes, parse_features(args.project_features), args.triplet)
+    if timings is not None and parse_stage is not None:
+        # The nodes are parsed while the metadata is loaded, time spent parsing is taken out of the metadata stage
+        nodes = timings.iter_timed(nodes, parse_stage)
+        parse_start = timings.stages.get(parse_stage, 0.0)
+    metadata_start = time.perf_counter()
+    dependencies_info = load_metadata(nodes, registry, max(1, args.jobs), incremental_state, timings, port_git_trees)
+    memory_checkpoint('metadata lookup')
+    if timings is not None:
+        metadata_time = time.perf_counter() - metadata_start
+        if parse_stage is not None:
+            metadata_time -= timings.stages.get(parse_stage, 0.0) - parse_start
+        timings.add('metadata lookup', metadata_time)
+
+    with stage('save caches'):
+        if incremental_state is not None:
+            incremental_state.save(list(dependencies_info))
+        registry.save_cache()
+
+    if args.mermaid:
+        with stage('mermaid'):
+            generate_mermaid_document(list(dependencies_info), links, args.dependencies_md)
+
+    with stage('build SPDX'):
+        spdx_document = build_spdx(project_data, dependencies_info, DependencyGraph(dependencies_info, links))
+    memory_checkpoint('build SPDX')
+    for output_format in output_formats:
+        with stage(f'write {output_format}'):
+            write_spdx(spdx_document, [output_format])
+        memory_checkpoint(f'write {output_format}')
+
+    if timings is not None:
+        if args.timings:
+            timings.print_report(args.timings_top)
+        if args.timings_json:
+            timings.write_json(args.timings_json, args.timings_top)
+    return list(dependencies_info)
+
+# --triplets: the graph is resolved once per triplet, as platform and supports expressions depend on it, but the
+# metadata of the ports is the same for all of them and is loaded only once for the union of the graphs
+def generate_triplet_projects(args, registry, output_formats):
+    triplets = parse_triplets(args.triplets)
+    if args.triplet:
+        raise LicencppError("--triplet cannot be combined with --triplets")
+    timings = Timings() if args.timings or args.timings_json else None
+    stage = timings.stage if timings is not None else lambda name: NO_TIMING
+
+    with stage('load project'):
+        project_data = load_project(args.project_vcpkg_json)
+        incremental_state = IncrementalState(args.state_file, args.verbose) if args.incremental else None
+        port_versions = get_project_port_versions(project_data, registry) if not args.ignore_baseline else None
+
+    dependencies_dgml = args.dependencies_dgml if args.pipe_dgml else (args.dependencies_dgml or 'dependencies.dgml')
+    features = parse_features(args.project_features)
+    graphs = {}
+    for triplet in triplets:
+        # Version constraints depend on the platform expressions, each triplet selects its own versions
+        triplet_versions = port_versions if port_versions is None or not graphs else registry.get_port_versions(project_data)
+        with stage(f'resolution {triplet}'):
+            nodes, links = resolve_graph(project_data, registry, features, args.resolver,
+                                         args.vcpkg_executable, get_triplet_path(dependencies_dgml, triplet) if dependencies_dgml else None,
+                                         args.pipe_dgml, with_links=True, verbose=args.verbose,
+                                         port_versions=triplet_versions, triplet=triplet)
+            nodes = list(nodes)
+        triplet_git_trees = None
+        if triplet_versions is not None:
+            with stage('version selection'):
+                triplet_git_trees = triplet_versions.select(nodes, features, triplet)
+        graphs[triplet] = (nodes, links, triplet_git_trees)
+    nodes = list(dict.fromkeys(node for triplet_nodes, _, _ in graphs.values() for node in triplet_nodes))
+    port_git_trees = None
+    if port_versions is not None:
+        port_git_trees = {}
+        for _, _, triplet_git_trees in graphs.values():
+            for node, git_tree in triplet_git_trees.items():
+                port_git_trees.setdefault(node, git_tree)
+    with stage('metadata lookup'):
+        dependencies_info = load_metadata(nodes, registry, max(1, args.jobs), incremental_state, timings, port_git_trees)
+    memory_checkpoint('metadata lookup')
+
+    with stage('save caches'):
+        if incremental_state is not None:
+            incremental_state.save(list(dependencies_info))
+        registry.save_cache()
+
+    for triplet, (triplet_nodes, links, triplet_git_trees) in graphs.items():
+        triplet_info = {node: dependencies_info[node] for node in triplet_nodes}
+        if triplet_git_trees is not None:
+            # The few ports selected at another version than for the first triplet that needs them
+            other_versions = [node for node in triplet_nodes if triplet_git_trees[node] != port_git_trees[node]]
+            if other_versions:
+                with stage('metadata lookup'):
+                    triplet_info.update(load_metadata(other_versions, registry, max(1, args.jobs), port_git_trees=triplet_git_trees))
+        if args.mermaid:
+            with stage('mermaid'):
+                generate_mermaid_document(triplet_nodes, links, get_triplet_path(args.dependencies_md, triplet))
+        with stage('build SPDX'):
+            spdx_document = build_spdx(project_data, triplet_info, DependencyGraph(triplet_info, links))
+        for output_format in output_formats:
+            with stage(f'write {output_format}'):
+                write_spdx(spdx_document, [output_format], triplet=triplet)
+        memory_checkpoint(f'SPDX {triplet}')
+
+    if timings is not None:
+        if args.timings:
+            timings.print_report(args.timings_top)
+        if args.timings_json:
+            timings.write_json(args.timings_json, args.timings_top)
+    return nodes
+
+def run_watch_command(args, registry, output_formats):
+    watcher = create_watcher(args.watch_interval, [os.path.basename(args.project_vcpkg_json)])
+    if args.verbose:
+        print(f"Watching for changes with {type(watcher).__name__}")
+    try:
+        while True:
+            start = time.perf_counter()
+            nodes = []
+            try:
+                nodes = generate_project(args, registry, output_formats)
+                print(f"SBOM generated for {len(nodes)} ports in {time.perf_counter() - start:.2f} s", flush=True)
+            except (LicencppError, ValueError, OSError) as error:
+                print(f"Error: {error}", flush=True)
+            watcher.set_paths(get_watched_paths(args.project_vcpkg_json, registry, nodes))
+            watcher.wait(None)
+            # Debounce: editors and git checkouts produce bursts of events, wait until things settle down
+            while watcher.wait(args.watch_debounce):
+                pass
+            # Only the ports whose vcpkg.json changed get parsed again, the rest stays in memory
+            registry.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+def run_batch_command(args, registry, output_formats):
+    if args.incremental:
+        raise LicencppError("--incremental cannot be combined with --batch")
+    if args.timings or args.timings_json:
+        raise LicencppError("--timings cannot be combined with --batch")
+    if args.triplets:
+        raise LicencppError("--triplets cannot be combined with --batch")
+    manifests = expand_manifests(args.batch)
+    if not manifests:
+        raise LicencppError(f"no manifest matches {', '.join(args.batch)}")
+    # Relative vcpkg and registry paths must keep working from each manifest's folder
+    registry.vcpkg_ports_dir = os.path.abspath(registry.vcpkg_ports_dir)
+    if registry.vcpkg_additional_registry != '':
+        registry.vcpkg_additional_registry = os.path.abspath(registry.vcpkg_additional_registry)
+    vcpkg_executable = args.vcpkg_executable
+    if os.path.dirname(vcpkg_executable):
+        vcpkg_executable = os.path.abspath(vcpkg_executable)
+    resolve_options = {
+        'features': parse_features(args.project_features),
+        'resolver': args.resolver,
+        'vcpkg_executable': vcpkg_executable,
+        'dependencies_dgml': args.dependencies_dgml if args.pipe_dgml else (args.dependencies_dgml or 'dependencies.dgml'),
+        'pipe_dgml': args.pipe_dgml,
+        'with_links': True,
+        'verbose': args.verbose,
+        'use_baseline': not args.ignore_baseline,
+        'triplet': args.triplet,
+    }
+    failures = run_batch(manifests, registry, output_formats, resolve_options, args.batch_processes,
+                         max(1, args.jobs), args.dependencies_md if args.mermaid else None)
+    print(f"Processed {len(manifests) - len(failures)} of {len(manifests)} manifests")
+    if failures:
+        for manifest, message in failures.items():
+            print(f"Error: {manifest}: {message}")
+        exit(1)
+
+def run_serve_command(args):
+    registry = PortRegistry(args.vcpkg_ports_dir, args.vcpkg_additional_registry,
+                            cache_dir=args.cache_dir, use_cache=not args.no_cache, verbose=args.verbose,
+                            vcpkg_ports_rev=args.vcpkg_ports_rev,
+                            vcpkg_additional_registry_rev=args.vcpkg_additional_registry_rev,
+                            registry_index=args.registry_index)
+    serve(registry, args.host, args.port, args.socket, args.resolver, args.vcpkg_executable,
+          max(1, args.jobs), args.verbose)
+
+def run_index_command(args):
+    registry = PortRegistry(args.vcpkg_ports_dir, args.vcpkg_additional_registry, use_cache=False, verbose=args.verbose,
+                            vcpkg_ports_rev=args.vcpkg_ports_rev,
+                            vcpkg_additional_registry_rev=args.vcpkg_additional_registry_rev)
+    try:
+        start = time.perf_counter()
+        counts, info = build_registry_snapshot(registry, args.output)
+    finally:
+        registry.close()
+    for name in SNAPSHOT_REGISTRIES:
+        if name in counts:
+            commit = info.get(f'{name}_commit')
+            print(f"{name.capitalize()} registry {info[f'{name}_source']}: {counts[name]} ports"
+                  + (f" at commit {commit}" if commit else " (not a git work tree, no commit recorded)"))
+    print(f"Registry index written to {args.output} in {time.perf_counter() - start:.2f} s")
 
-dependencies = parse_dgml(dependencies_dgml)
-dependencies_info = {}
+def print_welcome():
+    print(f"Welcome to {SCRIPT_NAME} v{SCRIPT_VERSION} - Licensed under {SCRIPT_LICENSE}\n")
 
-for dep in dependencies:
-    license, homepage, version, description = get_data_from_vcpkg_json(dep)
-    dependencies_info[dep] = {'license': license, 'homepage': homepage, 'version': version, 'description': description}
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    try:
+        if argv and argv[0] == 'index':
+            args = create_index_argument_parser().parse_args(argv[1:])
+            print_welcome()
+            run_index_command(args)
+        elif argv and argv[0] == 'serve':
+            args = create_serve_argument_parser().parse_args(argv[1:])
+            # Display welcome message, once the arguments are known to be valid
+            print_welcome()
+            run_serve_command(args)
+        else:
+            args = create_argument_parser().parse_args(argv)
+            print_welcome()
+            run(args)
+    except LicencppError as error:
+        print(f"Error: {error}")
+        exit(1)
 
-generate_spdx_document(dependencies_info)
+if __name__ == '__main__':
+    # Needed by the --batch process pool in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# SPDX license expressions, normalized against a bundled copy of the SPDX License List so that no network access
+# is needed:
+#   parse_license_expression('bsl-1.0 and (MIT or GPL-2.0+)')    -> AndExpression(License('BSL-1.0'), OrExpression(...))
+#   normalize_license_expression('bsl-1.0 and (MIT or GPL-2.0+)') -> 'BSL-1.0 AND (MIT OR GPL-2.0-or-later)'
+# Identifiers are matched case-insensitively, deprecated ones are replaced by their current equivalent and
+# identifiers missing from the list become LicenseRef-<name>. The same license strings appear in thousands of port
+# manifests, so parse results are cached and identical expressions are interned into a single object.
+# The identifier lists are those of https://github.com/spdx/license-list-data, which is released under CC0-1.0.
+
+import functools
+import re
+
+SPDX_LICENSE_LIST_VERSION = '3.25.0'
+
+# Current license identifiers
+LICENSE_IDS = '''
+0BSD 3D-Slicer-1.0 AAL Abstyles AdaCore-doc Adobe-2006 Adobe-Display-PostScript Adobe-Glyph Adobe-Utopia ADSL
+AFL-1.1 AFL-1.2 AFL-2.0 AFL-2.1 AFL-3.0 Afmparse AGPL-1.0-only AGPL-1.0-or-later AGPL-3.0-only AGPL-3.0-or-later
+Aladdin AMD-newlib AMDPLPA AML AML-glslang AMPAS ANTLR-PD ANTLR-PD-fallback any-OSI Apache-1.0 Apache-1.1 Apache-2.0
+APAFML APL-1.0 App-s2p APSL-1.0 APSL-1.1 APSL-1.2 APSL-2.0 Arphic-1999 Artistic-1.0 Artistic-1.0-cl8
+Artistic-1.0-Perl Artistic-2.0 ASWF-Digital-Assets-1.0 ASWF-Digital-Assets-1.1 Baekmuk Bahyph Barr
+bcrypt-Solar-Designer Beerware Bitstream-Charter Bitstream-Vera BitTorrent-1.0 BitTorrent-1.1 blessing BlueOak-1.0.0
+Boehm-GC Borceux Brian-Gladman-2-Clause Brian-Gladman-3-Clause BSD-1-Clause BSD-2-Clause BSD-2-Clause-Darwin
+BSD-2-Clause-first-lines BSD-2-Clause-Patent BSD-2-Clause-Views BSD-3-Clause BSD-3-Clause-acpica
+BSD-3-Clause-Attribution BSD-3-Clause-Clear BSD-3-Clause-flex BSD-3-Clause-HP BSD-3-Clause-LBNL
+BSD-3-Clause-Modification BSD-3-Clause-No-Military-License BSD-3-Clause-No-Nuclear-License
+BSD-3-Clause-No-Nuclear-License-2014 BSD-3-Clause-No-Nuclear-Warranty BSD-3-Clause-Open-MPI BSD-3-Clause-Sun
+BSD-4-Clause BSD-4-Clause-Shortened BSD-4-Clause-UC BSD-4.3RENO BSD-4.3TAHOE BSD-Advertising-Acknowledgement
+BSD-Attribution-HPND-disclaimer BSD-Inferno-Nettverk BSD-Protection BSD-Source-beginning-file BSD-Source-Code
+BSD-Systemics BSD-Systemics-W3Works BSL-1.0 BUSL-1.1 bzip2-1.0.6 C-UDA-1.0 CAL-1.0 CAL-1.0-Combined-Work-Exception
+Caldera Caldera-no-preamble Catharon CATOSL-1.1 CC-BY-1.0 CC-BY-2.0 CC-BY-2.5 CC-BY-2.5-AU CC-BY-3.0 CC-BY-3.0-AT
+CC-BY-3.0-AU CC-BY-3.0-DE CC-BY-3.0-IGO CC-BY-3.0-NL CC-BY-3.0-US CC-BY-4.0 CC-BY-NC-1.0 CC-BY-NC-2.0 CC-BY-NC-2.5
+CC-BY-NC-3.0 CC-BY-NC-3.0-DE CC-BY-NC-4.0 CC-BY-NC-ND-1.0 CC-BY-NC-ND-2.0 CC-BY-NC-ND-2.5 CC-BY-NC-ND-3.0
+CC-BY-NC-ND-3.0-DE CC-BY-NC-ND-3.0-IGO CC-BY-NC-ND-4.0 CC-BY-NC-SA-1.0 CC-BY-NC-SA-2.0 CC-BY-NC-SA-2.0-DE
+CC-BY-NC-SA-2.0-FR CC-BY-NC-SA-2.0-UK CC-BY-NC-SA-2.5 CC-BY-NC-SA-3.0 CC-BY-NC-SA-3.0-DE CC-BY-NC-SA-3.0-IGO
+CC-BY-NC-SA-4.0 CC-BY-ND-1.0 CC-BY-ND-2.0 CC-BY-ND-2.5 CC-BY-ND-3.0 CC-BY-ND-3.0-DE CC-BY-ND-4.0 CC-BY-SA-1.0
+CC-BY-SA-2.0 CC-BY-SA-2.0-UK CC-BY-SA-2.1-JP CC-BY-SA-2.5 CC-BY-SA-3.0 CC-BY-SA-3.0-AT CC-BY-SA-3.0-DE
+CC-BY-SA-3.0-IGO CC-BY-SA-4.0 CC-PDDC CC0-1.0 CDDL-1.0 CDDL-1.1 CDL-1.0 CDLA-Permissive-1.0 CDLA-Permissive-2.0
+CDLA-Sharing-1.0 CECILL-1.0 CECILL-1.1 CECILL-2.0 CECILL-2.1 CECILL-B CECILL-C CERN-OHL-1.1 CERN-OHL-1.2
+CERN-OHL-P-2.0 CERN-OHL-S-2.0 CERN-OHL-W-2.0 CFITSIO check-cvs checkmk ClArtistic Clips CMU-Mach CMU-Mach-nodoc
+CNRI-Jython CNRI-Python CNRI-Python-GPL-Compatible COIL-1.0 Community-Spec-1.0 Condor-1.1 copyleft-next-0.3.0
+copyleft-next-0.3.1 Cornell-Lossless-JPEG CPAL-1.0 CPL-1.0 CPOL-1.02 Cronyx Crossword CrystalStacker CUA-OPL-1.0
+Cube curl cve-tou D-FSL-1.0 DEC-3-Clause diffmark DL-DE-BY-2.0 DL-DE-ZERO-2.0 DOC DocBook-Schema DocBook-XML Dotseqn
+DRL-1.0 DRL-1.1 DSDP dtoa dvipdfm ECL-1.0 ECL-2.0 EFL-1.0 EFL-2.0 eGenix Elastic-2.0 Entessa EPICS EPL-1.0 EPL-2.0
+ErlPL-1.1 etalab-2.0 EUDatagrid EUPL-1.0 EUPL-1.1 EUPL-1.2 Eurosym Fair FBM FDK-AAC Ferguson-Twofish Frameworx-1.0
+FreeBSD-DOC FreeImage FSFAP FSFAP-no-warranty-disclaimer FSFUL FSFULLR FSFULLRWD FTL Furuseth fwlw GCR-docs GD
+GFDL-1.1-invariants-only GFDL-1.1-invariants-or-later GFDL-1.1-no-invariants-only GFDL-1.1-no-invariants-or-later
+GFDL-1.1-only GFDL-1.1-or-later GFDL-1.2-invariants-only GFDL-1.2-invariants-or-later GFDL-1.2-no-invariants-only
+GFDL-1.2-no-invariants-or-later GFDL-1.2-only GFDL-1.2-or-later GFDL-1.3-invariants-only
+GFDL-1.3-invariants-or-later GFDL-1.3-no-invariants-only GFDL-1.3-no-invariants-or-later GFDL-1.3-only
+GFDL-1.3-or-later Giftware GL2PS Glide Glulxe GLWTPL gnuplot GPL-1.0-only GPL-1.0-or-later GPL-2.0-only
+GPL-2.0-or-later GPL-3.0-only GPL-3.0-or-later Graphics-Gems gSOAP-1.3b gtkbook Gutmann HaskellReport hdparm HIDAPI
+Hippocratic-2.1 HP-1986 HP-1989 HPND HPND-DEC HPND-doc HPND-doc-sell HPND-export-US HPND-export-US-acknowledgement
+HPND-export-US-modify HPND-export2-US HPND-Fenneberg-Livingston HPND-INRIA-IMAG HPND-Intel HPND-Kevlin-Henney
+HPND-Markus-Kuhn HPND-merchantability-variant HPND-MIT-disclaimer HPND-Netrek HPND-Pbmplus
+HPND-sell-MIT-disclaimer-xserver HPND-sell-regexpr HPND-sell-variant HPND-sell-variant-MIT-disclaimer
+HPND-sell-variant-MIT-disclaimer-rev HPND-UC HPND-UC-export-US HTMLTIDY IBM-pibs ICU IEC-Code-Components-EULA IJG
+IJG-short ImageMagick iMatix Imlib2 Info-ZIP Inner-Net-2.0 Intel Intel-ACPI Interbase-1.0 IPA IPL-1.0 ISC
+ISC-Veillard Jam JasPer-2.0 JPL-image JPNIC JSON Kastrup Kazlib Knuth-CTAN LAL-1.2 LAL-1.3 Latex2e
+Latex2e-translated-notice Leptonica LGPL-2.0-only LGPL-2.0-or-later LGPL-2.1-only LGPL-2.1-or-later LGPL-3.0-only
+LGPL-3.0-or-later LGPLLR Libpng libpng-2.0 libselinux-1.0 libtiff libutil-David-Nugent LiLiQ-P-1.1 LiLiQ-R-1.1
+LiLiQ-Rplus-1.1 Linux-man-pages-1-para Linux-man-pages-copyleft Linux-man-pages-copyleft-2-para
+Linux-man-pages-copyleft-var Linux-OpenIB LOOP LPD-document LPL-1.0 LPL-1.02 LPPL-1.0 LPPL-1.1 LPPL-1.2 LPPL-1.3a
+LPPL-1.3c lsof Lucida-Bitmap-Fonts LZMA-SDK-9.11-to-9.20 LZMA-SDK-9.22 Mackerras-3-Clause
+Mackerras-3-Clause-acknowledgment magaz mailprio MakeIndex Martin-Birgmeier McPhee-slideshow metamail Minpack MirOS
+MIT MIT-0 MIT-advertising MIT-CMU MIT-enna MIT-feh MIT-Festival MIT-Khronos-old MIT-Modern-Variant MIT-open-group
+MIT-testregex MIT-Wu MITNFA MMIXware Motosoto MPEG-SSG mpi-permissive mpich2 MPL-1.0 MPL-1.1 MPL-2.0
+MPL-2.0-no-copyleft-exception mplus MS-LPL MS-PL MS-RL MTLL MulanPSL-1.0 MulanPSL-2.0 Multics Mup NAIST-2003
+NASA-1.3 Naumen NBPL-1.0 NCBI-PD NCGL-UK-2.0 NCL NCSA NetCDF Newsletr NGPL NICTA-1.0 NIST-PD NIST-PD-fallback
+NIST-Software NLOD-1.0 NLOD-2.0 NLPL Nokia NOSL Noweb NPL-1.0 NPL-1.1 NPOSL-3.0 NRL NTP NTP-0 O-UDA-1.0 OAR OCCT-PL
+OCLC-2.0 ODbL-1.0 ODC-By-1.0 OFFIS OFL-1.0 OFL-1.0-no-RFN OFL-1.0-RFN OFL-1.1 OFL-1.1-no-RFN OFL-1.1-RFN OGC-1.0
+OGDL-Taiwan-1.0 OGL-Canada-2.0 OGL-UK-1.0 OGL-UK-2.0 OGL-UK-3.0 OGTSL OLDAP-1.1 OLDAP-1.2 OLDAP-1.3 OLDAP-1.4
+OLDAP-2.0 OLDAP-2.0.1 OLDAP-2.1 OLDAP-2.2 OLDAP-2.2.1 OLDAP-2.2.2 OLDAP-2.3 OLDAP-2.4 OLDAP-2.5 OLDAP-2.6 OLDAP-2.7
+OLDAP-2.8 OLFL-1.3 OML OpenPBS-2.3 OpenSSL OpenSSL-standalone OpenVision OPL-1.0 OPL-UK-3.0 OPUBL-1.0 OSET-PL-2.1
+OSL-1.0 OSL-1.1 OSL-2.0 OSL-2.1 OSL-3.0 PADL Parity-6.0.0 Parity-7.0.0 PDDL-1.0 PHP-3.0 PHP-3.01 Pixar pkgconf
+Plexus pnmstitch PolyForm-Noncommercial-1.0.0 PolyForm-Small-Business-1.0.0 PostgreSQL PPL PSF-2.0 psfrag psutils
+Python-2.0 Python-2.0.1 python-ldap Qhull QPL-1.0 QPL-1.0-INRIA-2004 radvd Rdisc RHeCos-1.1 RPL-1.1 RPL-1.5 RPSL-1.0
+RSA-MD RSCPL Ruby Ruby-pty SAX-PD SAX-PD-2.0 Saxpath SCEA SchemeReport Sendmail Sendmail-8.23 SGI-B-1.0 SGI-B-1.1
+SGI-B-2.0 SGI-OpenGL SGP4 SHL-0.5 SHL-0.51 SimPL-2.0 SISSL SISSL-1.2 SL Sleepycat SMLNJ SMPPL SNIA snprintf
+softSurfer Soundex Spencer-86 Spencer-94 Spencer-99 SPL-1.0 ssh-keyscan SSH-OpenSSH SSH-short SSLeay-standalone
+SSPL-1.0 SugarCRM-1.1.3 Sun-PPP Sun-PPP-2000 SunPro SWL swrule Symlinks TAPR-OHL-1.0 TCL TCP-wrappers TermReadKey
+TGPPL-1.0 threeparttable TMate TORQUE-1.1 TOSL TPDL TPL-1.0 TTWL TTYP0 TU-Berlin-1.0 TU-Berlin-2.0 Ubuntu-font-1.0
+UCAR UCL-1.0 ulem UMich-Merit Unicode-3.0 Unicode-DFS-2015 Unicode-DFS-2016 Unicode-TOU UnixCrypt Unlicense UPL-1.0
+URT-RLE Vim VOSTROM VSL-1.0 W3C W3C-19980720 W3C-20150513 w3m Watcom-1.0 Widget-Workshop Wsuipa WTFPL X11
+X11-distribute-modifications-variant X11-swapped Xdebug-1.03 Xerox Xfig XFree86-1.1 xinetd xkeyboard-config-Zinoviev
+xlock Xnet xpp XSkat xzoom YPL-1.0 YPL-1.1 Zed Zeeff Zend-2.0 Zimbra-1.3 Zimbra-1.4 Zlib zlib-acknowledgement
+ZPL-1.1 ZPL-2.0 ZPL-2.1
+'''
+
+# Deprecated license identifiers, still valid in SPDX documents
+DEPRECATED_LICENSE_IDS = '''
+AGPL-1.0 AGPL-3.0 BSD-2-Clause-FreeBSD BSD-2-Clause-NetBSD bzip2-1.0.5 eCos-2.0 GFDL-1.1 GFDL-1.2 GFDL-1.3 GPL-1.0
+GPL-1.0+ GPL-2.0 GPL-2.0+ GPL-2.0-with-autoconf-exception GPL-2.0-with-bison-exception
+GPL-2.0-with-classpath-exception GPL-2.0-with-font-exception GPL-2.0-with-GCC-exception GPL-3.0 GPL-3.0+
+GPL-3.0-with-autoconf-exception GPL-3.0-with-GCC-exception LGPL-2.0 LGPL-2.0+ LGPL-2.1 LGPL-2.1+ LGPL-3.0 LGPL-3.0+
+Net-SNMP Nunit StandardML-NJ wxWindows
+'''
+
+# Current license exception identifiers
+EXCEPTION_IDS = '''
+389-exception Asterisk-exception Asterisk-linking-protocols-exception Autoconf-exception-2.0 Autoconf-exception-3.0
+Autoconf-exception-generic Autoconf-exception-generic-3.0 Autoconf-exception-macro Bison-exception-1.24
+Bison-exception-2.2 Bootloader-exception Classpath-exception-2.0 CLISP-exception-2.0 cryptsetup-OpenSSL-exception
+DigiRule-FOSS-exception eCos-exception-2.0 erlang-otp-linking-exception Fawkes-Runtime-exception FLTK-exception
+fmt-exception Font-exception-2.0 freertos-exception-2.0 GCC-exception-2.0 GCC-exception-2.0-note GCC-exception-3.1
+Gmsh-exception GNAT-exception GNOME-examples-exception GNU-compiler-exception gnu-javamail-exception
+GPL-3.0-interface-exception GPL-3.0-linking-exception GPL-3.0-linking-source-exception GPL-CC-1.0
+GStreamer-exception-2005 GStreamer-exception-2008 i2p-gpl-java-exception KiCad-libraries-exception
+LGPL-3.0-linking-exception libpri-OpenH323-exception Libtool-exception Linux-syscall-note LLGPL LLVM-exception
+LZMA-exception mif-exception OCaml-LGPL-linking-exception OCCT-exception-1.0 OpenJDK-assembly-exception-1.0
+openvpn-openssl-exception PCRE2-exception PS-or-PDF-font-exception-20170817 QPL-1.0-INRIA-2004-exception
+Qt-GPL-exception-1.0 Qt-LGPL-exception-1.1 Qwt-exception-1.0 romic-exception RRDtool-FLOSS-exception-2.0
+SANE-exception SHL-2.0 SHL-2.1 stunnel-exception SWI-exception Swift-exception Texinfo-exception
+u-boot-exception-2.0 UBDL-exception Universal-FOSS-exception-1.0 vsftpd-openssl-exception WxWindows-exception-3.1
+x11vnc-openssl-exception
+'''
+
+# Deprecated license exception identifiers
+DEPRECATED_EXCEPTION_IDS = '''
+Nokia-Qt-exception-1.1
+'''
+
+# Replacements of the deprecated identifiers that have one
+DEPRECATED_LICENSE_REPLACEMENTS = {
+    'AGPL-1.0': 'AGPL-1.0-only',
+    'AGPL-3.0': 'AGPL-3.0-only',
+    'BSD-2-Clause-FreeBSD': 'BSD-2-Clause',
+    'BSD-2-Clause-NetBSD': 'BSD-2-Clause',
+    'bzip2-1.0.5': 'bzip2-1.0.6',
+    'eCos-2.0': 'GPL-2.0-or-later WITH eCos-exception-2.0',
+    'GFDL-1.1': 'GFDL-1.1-only',
+    'GFDL-1.2': 'GFDL-1.2-only',
+    'GFDL-1.3': 'GFDL-1.3-only',
+    'GPL-1.0': 'GPL-1.0-only',
+    'GPL-1.0+': 'GPL-1.0-or-later',
+    'GPL-2.0': 'GPL-2.0-only',
+    'GPL-2.0+': 'GPL-2.0-or-later',
+    'GPL-2.0-with-autoconf-exception': 'GPL-2.0-only WITH Autoconf-exception-2.0',
+    'GPL-2.0-with-bison-exception': 'GPL-2.0-or-later WITH Bison-exception-2.2',
+    'GPL-2.0-with-classpath-exception': 'GPL-2.0-only WITH Classpath-exception-2.0',
+    'GPL-2.0-with-font-exception': 'GPL-2.0-only WITH Font-exception-2.0',
+    'GPL-2.0-with-GCC-exception': 'GPL-2.0-only WITH GCC-exception-2.0',
+    'GPL-3.0': 'GPL-3.0-only',
+    'GPL-3.0+': 'GPL-3.0-or-later',
+    'GPL-3.0-with-autoconf-exception': 'GPL-3.0-only WITH Autoconf-exception-3.0',
+    'GPL-3.0-with-GCC-exception': 'GPL-3.0-only WITH GCC-exception-3.1',
+    'LGPL-2.0': 'LGPL-2.0-only',
+    'LGPL-2.0+': 'LGPL-2.0-or-later',
+    'LGPL-2.1': 'LGPL-2.1-only',
+    'LGPL-2.1+': 'LGPL-2.1-or-later',
+    'LGPL-3.0': 'LGPL-3.0-only',
+    'LGPL-3.0+': 'LGPL-3.0-or-later',
+    'Nunit': 'zlib-acknowledgement',
+    'StandardML-NJ': 'SMLNJ',
+    'wxWindows': 'GPL-2.0-or-later WITH WxWindows-exception-3.1',
+}
+
+# Lower case identifier -> identifier as spelled in the list
+LICENSES = {identifier.lower(): identifier for identifier in (LICENSE_IDS + DEPRECATED_LICENSE_IDS).split()}
+EXCEPTIONS = {identifier.lower(): identifier for identifier in (EXCEPTION_IDS + DEPRECATED_EXCEPTION_IDS).split()}
+
+class LicenseExpressionError(ValueError):
+    pass
+
+# The nodes of a parsed expression. They are immutable, compare by identity once interned, and str() renders the
+# normalized expression, with parentheses around every compound operand of AND and OR.
+class License:
+    __slots__ = ('identifier', 'text')
+
+    def __init__(self, identifier):
+        self.identifier = identifier
+        self.text = identifier
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.text!r})"
+
+    def get_license_ids(self):
+        return [self.identifier]
+
+class WithException(License):
+    __slots__ = ('license', 'exception')
+
+    def __init__(self, license, exception):
+        self.license = license
+        self.exception = exception
+        self.text = f'{license} WITH {exception}'
+
+    def get_license_ids(self):
+        return self.license.get_license_ids()
+
+class CompoundExpression(License):
+    __slots__ = ('operands',)
+    operator = None
+
+    def __init__(self, operands):
+        self.operands = tuple(operands)
+        self.text = f' {self.operator} '.join(
+            f'({operand})' if isinstance(operand, CompoundExpression) else str(operand) for operand in self.operands)
+
+    def get_license_ids(self):
+        return [identifier for operand in self.operands for identifier in operand.get_license_ids()]
+
+class AndExpression(CompoundExpression):
+    __slots__ = ()
+    operator = 'AND'
+
+class OrExpression(CompoundExpression):
+    __slots__ = ()
+    operator = 'OR'
+
+interned_nodes = {}
+
+def intern_node(node):
+    # Two nodes with the same normalized text are the same expression
+    return interned_nodes.setdefault((type(node), node.text), node)
+
+TOKEN_PATTERN = re.compile(r'\s*(?:([()])|([A-Za-z0-9.:-]+\+?)|(\S))')
+
+def tokenize_license_expression(expression):
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(expression):
+        symbol, word, other = match.groups()
+        if other is not None:
+            raise LicenseExpressionError(f"Unexpected character '{other}' in license expression '{expression}'")
+        if symbol is not None:
+            tokens.append(symbol)
+        elif word is not None:
+            # Operators are not case sensitive in practice, 'mit and zlib' is common enough
+            tokens.append(word.upper() if word.upper() in ('AND', 'OR', 'WITH') else word)
+    return tokens
+
+# Anything can be turned into a LicenseRef, whose idstring only allows letters, digits, '.' and '-'
+def get_license_ref(name):
+    idstring = re.sub(r'[^A-Za-z0-9.]+', '-', re.sub(r'(?i)^\s*licenseref-', '', name)).strip('-')
+    return f'LicenseRef-{idstring}' if idstring else None
+
+# LicenseRef-<idstring> or DocumentRef-<idstring>:LicenseRef-<idstring>, whatever the case of the prefixes
+LICENSE_REF_PATTERN = re.compile(r'(?i)(?:documentref-([A-Za-z0-9.-]+):)?licenseref-([A-Za-z0-9.-]+)')
+
+def get_license_ref_node(identifier):
+    match = LICENSE_REF_PATTERN.fullmatch(identifier)
+    if match is None:
+        raise LicenseExpressionError(f"'{identifier}' is not a valid LicenseRef")
+    document, idstring = match.groups()
+    prefix = f'DocumentRef-{document}:' if document else ''
+    return intern_node(License(f'{prefix}LicenseRef-{idstring}'))
+
+# 'or later' of a license node: GPL-2.0-only becomes GPL-2.0-or-later, the exception of a WITH is kept, and
+# identifiers without -only/-or-later forms take a '+'
+def get_or_later_node(node):
+    if type(node) is WithException:
+        return intern_node(WithException(get_or_later_node(node.license), node.exception))
+    identifier = node.identifier
+    if identifier.endswith('-or-later'):
+        return node
+    if identifier.endswith('-only'):
+        or_later = LICENSES.get(f'{identifier[:-len("-only")]}-or-later'.lower())
+        if or_later is None:
+            raise LicenseExpressionError(f"'{identifier}' has no 'or later' form")
+        return intern_node(License(or_later))
+    return intern_node(License(f'{identifier}+'))
+
+def get_license_node(identifier):
+    lower = identifier.lower()
+    if lower.startswith(('licenseref-', 'documentref-')):
+        return get_license_ref_node(identifier)
+    canonical = LICENSES.get(lower)
+    plus = False
+    if canonical is None and lower.endswith('+'):
+        canonical, plus = LICENSES.get(lower[:-1]), True
+    if canonical is None:
+        license_ref = get_license_ref(identifier)
+        if license_ref is None:
+            raise LicenseExpressionError(f"'{identifier}' is not a license identifier")
+        return intern_node(License(license_ref))
+    replacement = DEPRECATED_LICENSE_REPLACEMENTS.get(canonical)
+    node = parse_license_expression(replacement) if replacement is not None else intern_node(License(canonical))
+    return get_or_later_node(node) if plus else node
+
+# Grammar, by increasing precedence: or := and ('OR' and)* ; and := with ('AND' with)* ;
+# with := simple ('WITH' exception)? | '(' or ')'
+@functools.lru_cache(maxsize=None)
+def parse_license_expression(expression):
+    tokens = tokenize_license_expression(expression)
+    if not tokens:
+        raise LicenseExpressionError("Empty license expression")
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def parse_compound(operator, node_type, parse_operand):
+        nonlocal position
+        operands = [parse_operand()]
+        while peek() == operator:
+            position += 1
+            operands.append(parse_operand())
+        if len(operands) == 1:
+            return operands[0]
+        # 'A AND (B AND C)' is 'A AND B AND C'
+        flat = []
+        for operand in operands:
+            flat.extend(operand.operands if type(operand) is node_type else [operand])
+        return intern_node(node_type(flat))
+
+    def parse_or():
+        return parse_compound('OR', OrExpression, parse_and)
+
+    def parse_and():
+        return parse_compound('AND', AndExpression, parse_with)
+
+    def parse_with():
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise LicenseExpressionError(f"Unexpected end of license expression '{expression}'")
+        position += 1
+        if token == '(':
+            node = parse_or()
+            if peek() != ')':
+                raise LicenseExpressionError(f"Missing ')' in license expression '{expression}'")
+            position += 1
+            return node
+        if token in (')', 'AND', 'OR', 'WITH'):
+            raise LicenseExpressionError(f"Unexpected '{token}' in license expression '{expression}'")
+        node = get_license_node(token)
+        if peek() == 'WITH':
+            position += 1
+            exception = peek()
+            if exception is None or exception in ('(', ')', 'AND', 'OR', 'WITH'):
+                raise LicenseExpressionError(f"Missing exception after WITH in license expression '{expression}'")
+            position += 1
+            # Exceptions cannot be LicenseRefs, and a deprecated identifier such as wxWindows may already carry one
+            if exception.lower() not in EXCEPTIONS:
+                raise LicenseExpressionError(f"Unknown license exception '{exception}' in license expression '{expression}'")
+            if type(node) is not License:
+                raise LicenseExpressionError(f"'{token}' cannot take another exception in license expression '{expression}'")
+            node = intern_node(WithException(node, EXCEPTIONS[exception.lower()]))
+        return node
+
+    node = parse_or()
+    if position != len(tokens):
+        raise LicenseExpressionError(f"Unexpected '{tokens[position]}' in license expression '{expression}'")
+    return node
+
+# The normalized form of a license string, for licenseDeclared. Strings that are not valid expressions at all
+# (e.g. 'public domain' or 'MIT/X11') become a single LicenseRef; None and blank strings give None.
+@functools.lru_cache(maxsize=None)
+def normalize_license_expression(expression):
+    if expression is None or not expression.strip():
+        return None
+    try:
+        return str(parse_license_expression(expression))
+    except LicenseExpressionError:
+        return get_license_ref(expression)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from licencpp import DependencyGraph, build_spdx  # noqa: E402
+
+
+class DependencyGraphTest(unittest.TestCase):
+    def test_edges_are_grouped_by_source_sorted_and_deduplicated(self):
+        graph = DependencyGraph(['project', 'zlib', 'curl', 'openssl'],
+                                [('curl', 'zlib'), ('project', 'curl'), ('curl', 'openssl'), ('curl', 'zlib'),
+                                 ('project', 'curl'), ('openssl', 'zlib')])
+        self.assertEqual(list(graph.iter_edges()), [('project', 'curl'), ('curl', 'zlib'), ('curl', 'openssl'),
+                                                    ('openssl', 'zlib')])
+        self.assertEqual(list(graph.offsets), [0, 1, 1, 3, 4])
+
+    def test_self_edges_and_unknown_nodes_are_dropped(self):
+        graph = DependencyGraph(['project', 'foo'], [('foo', 'foo'), ('project', 'foo'), ('foo', 'missing'),
+                                                     ('missing', 'foo')])
+        self.assertEqual(list(graph.iter_edges()), [('project', 'foo')])
+
+    def test_empty_graph(self):
+        self.assertEqual(list(DependencyGraph([], []).iter_edges()), [])
+        self.assertEqual(list(DependencyGraph(['project'], []).iter_edges()), [])
+
+
+class BuildSpdxRelationshipsTest(unittest.TestCase):
+    def get_relationships(self, dependency_graph):
+        info = {'license': 'MIT', 'homepage': None, 'version': '1.0', 'description': None}
+        document = build_spdx({'name': 'project'}, {'project': info, 'curl': info, 'zlib': info}, dependency_graph)
+        return [(relationship['spdxElementId'], relationship['relatedSpdxElement'])
+                for relationship in document['relationships']]
+
+    def test_one_relationship_per_edge(self):
+        graph = DependencyGraph(['project', 'curl', 'zlib'], [('project', 'curl'), ('curl', 'zlib'), ('zlib', 'zlib')])
+        self.assertEqual(self.get_relationships(graph), [('SPDXRef-Package-project', 'SPDXRef-Package-curl'),
+                                                         ('SPDXRef-Package-curl', 'SPDXRef-Package-zlib')])
+
+    def test_without_a_graph_the_project_depends_on_every_package(self):
+        self.assertEqual(self.get_relationships(None), [('SPDXRef-Package-project', 'SPDXRef-Package-curl'),
+                                                        ('SPDXRef-Package-project', 'SPDXRef-Package-zlib')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# The native resolver, on small ports folders written to a temporary folder
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import licencpp  # noqa: E402
+
+
+# Writes ports/<name>/vcpkg.json for every {name: manifest} and returns the ports folder
+def write_ports_dir(root, ports):
+    ports_dir = os.path.join(root, 'ports')
+    for name, manifest in ports.items():
+        os.makedirs(os.path.join(ports_dir, name))
+        with open(os.path.join(ports_dir, name, 'vcpkg.json'), 'w') as file:
+            json.dump(dict(manifest, name=name, version='1.0.0'), file)
+    return ports_dir
+
+
+class NativeResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def resolve(self, ports, project, features=(), triplet='x64-linux'):
+        ports_dir = write_ports_dir(tempfile.mkdtemp(dir=self.root.name), ports)
+        registry = licencpp.PortRegistry(ports_dir, use_cache=False)
+        project_data = dict(project, name='project', version='1.0.0')
+        try:
+            nodes, links = licencpp.resolve_graph(project_data, registry, features, 'native', triplet=triplet)
+        finally:
+            registry.close()
+        return set(nodes) - {'project'}, set(links)
+
+    def test_features_and_default_features_are_expanded(self):
+        ports = {
+            'foo': {'dependencies': ['zlib'], 'default-features': ['ssl'],
+                    'features': {'ssl': {'description': 'ssl', 'dependencies': ['openssl']},
+                                 'http2': {'description': 'http2', 'dependencies': [{'name': 'foo', 'features': ['ssl']},
+                                                                                    'nghttp2']}}},
+            'zlib': {}, 'openssl': {}, 'nghttp2': {}, 'brotli': {},
+        }
+        nodes, links = self.resolve(ports, {'dependencies': ['foo']})
+        self.assertEqual(nodes, {'foo', 'zlib', 'openssl'})
+        self.assertEqual(links, {('project', 'foo'), ('foo', 'zlib'), ('foo', 'openssl')})
+        nodes, _ = self.resolve(ports, {'dependencies': [{'name': 'foo', 'default-features': False}]})
+        self.assertEqual(nodes, {'foo', 'zlib'})
+        # A feature depending on another feature of its own port adds no self edge
+        nodes, links = self.resolve(ports, {'dependencies': [{'name': 'foo', 'default-features': False,
+                                                              'features': ['http2']}]})
+        self.assertEqual(nodes, {'foo', 'zlib', 'openssl', 'nghttp2'})
+        self.assertNotIn(('foo', 'foo'), links)
+
+    def test_project_features(self):
+        ports = {'zlib': {}, 'brotli': {}}
+        project = {'dependencies': ['zlib'], 'default-features': ['compression'],
+                   'features': {'compression': {'description': 'compression', 'dependencies': ['brotli']},
+                                'tests': {'description': 'tests', 'dependencies': ['gtest']}}}
+        self.assertEqual(self.resolve(ports, project)[0], {'zlib', 'brotli'})
+        self.assertEqual(self.resolve(ports, project, features=['core'])[0], {'zlib'})
+        with self.assertRaisesRegex(licencpp.LicencppError, 'gtest'):
+            self.resolve(ports, project, features=['tests'])
+        with self.assertRaisesRegex(licencpp.LicencppError, "no feature named 'missing'"):
+            self.resolve(ports, project, features=['missing'])
+
+    def test_host_dependencies_use_the_host_triplet(self):
+        ports = {
+            'tool': {'dependencies': [{'name': 'linux-only', 'platform': 'linux'},
+                                      {'name': 'windows-only', 'platform': 'windows'}]},
+            'linux-only': {}, 'windows-only': {},
+        }
+        with mock.patch.dict(os.environ, {'VCPKG_DEFAULT_HOST_TRIPLET': 'x64-linux'}):
+            self.assertEqual(self.resolve(ports, {'dependencies': [{'name': 'tool', 'host': True}]},
+                                          triplet='x64-windows')[0], {'tool', 'linux-only'})
+            self.assertEqual(self.resolve(ports, {'dependencies': ['tool']}, triplet='x64-windows')[0],
+                             {'tool', 'windows-only'})
+
+    def test_dependencies_are_filtered_by_platform(self):
+        ports = {'foo': {'dependencies': [{'name': 'winapi', 'platform': 'windows & !uwp'},
+                                          {'name': 'pthreads', 'platform': '!windows'}]},
+                 'winapi': {}, 'pthreads': {}}
+        self.assertEqual(self.resolve(ports, {'dependencies': ['foo']}, triplet='x64-linux')[0], {'foo', 'pthreads'})
+        self.assertEqual(self.resolve(ports, {'dependencies': ['foo']}, triplet='x64-windows')[0], {'foo', 'winapi'})
+        self.assertEqual(self.resolve(ports, {'dependencies': ['foo']}, triplet='x64-uwp')[0], {'foo'})
+
+    def test_unsupported_ports_are_pruned_with_what_only_they_pull_in(self):
+        ports = {
+            'foo': {'dependencies': ['winonly', 'shared']},
+            'winonly': {'supports': 'windows', 'dependencies': ['winhelper', 'shared']},
+            'winhelper': {}, 'shared': {},
+        }
+        nodes, links = self.resolve(ports, {'dependencies': ['foo']}, triplet='x64-linux')
+        self.assertEqual(nodes, {'foo', 'shared'})
+        self.assertEqual(links, {('project', 'foo'), ('foo', 'shared')})
+        self.assertEqual(self.resolve(ports, {'dependencies': ['foo']}, triplet='x64-windows')[0],
+                         {'foo', 'winonly', 'winhelper', 'shared'})
+        with self.assertRaisesRegex(licencpp.LicencppError, 'does not support the triplet x64-linux'):
+            self.resolve(ports, {'dependencies': ['foo'], 'supports': 'windows'}, triplet='x64-linux')
+
+    def test_malformed_platform_expressions_name_the_port(self):
+        for manifest in ({'supports': 'windows &'}, {'dependencies': [{'name': 'zlib', 'platform': '(linux'}]}):
+            with self.assertRaisesRegex(licencpp.LicencppError, 'invalid platform expression in foo'):
+                self.resolve({'foo': manifest, 'zlib': {}}, {'dependencies': ['foo']})
+
+    def test_default_features_opt_out_only_applies_to_the_project(self):
+        ports = {
+            'foo': {'default-features': ['extra'],
+                    'features': {'extra': {'description': 'extra', 'dependencies': ['baz']}}},
+            'bar': {'dependencies': [{'name': 'foo', 'default-features': False}]},
+            'baz': {},
+        }
+        # A port cannot turn off the default features of its dependencies
+        self.assertEqual(self.resolve(ports, {'dependencies': ['bar']})[0], {'bar', 'foo', 'baz'})
+        # The project can, and ports depending on the same port do not bring them back
+        self.assertEqual(self.resolve(ports, {'dependencies': [{'name': 'foo', 'default-features': False}]})[0], {'foo'})
+        self.assertEqual(self.resolve(ports, {'dependencies': ['bar', {'name': 'foo', 'default-features': False}]})[0],
+                         {'bar', 'foo'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import licencpp  # noqa: E402
+from licencpp import PlatformExpressionError, compile_platform_expression, get_triplet_identifiers  # noqa: E402
+
+
+class TripletIdentifiersTest(unittest.TestCase):
+    def test_identifiers(self):
+        self.assertEqual(get_triplet_identifiers('x64-linux', 'x64-linux'), {'x64', 'linux', 'static', 'native'})
+        self.assertEqual(get_triplet_identifiers('x64-windows', 'x64-linux'), {'x64', 'windows'})
+        self.assertEqual(get_triplet_identifiers('x64-windows-static', 'x64-linux'),
+                         {'x64', 'windows', 'static', 'staticcrt'})
+        self.assertEqual(get_triplet_identifiers('arm64-uwp', 'x64-linux'), {'arm64', 'arm', 'uwp', 'windows'})
+
+
+class CompilePlatformExpressionTest(unittest.TestCase):
+    def evaluate(self, expression, triplet):
+        return compile_platform_expression(expression)(get_triplet_identifiers(triplet, 'x64-linux'))
+
+    def test_operators(self):
+        self.assertTrue(self.evaluate('windows & !uwp', 'x64-windows'))
+        self.assertFalse(self.evaluate('windows & !uwp', 'x64-uwp'))
+        self.assertTrue(self.evaluate('!(windows | osx)', 'x64-linux'))
+        self.assertTrue(self.evaluate('linux, x64', 'x64-linux'))
+        self.assertFalse(self.evaluate('linux, arm64', 'x64-linux'))
+        self.assertTrue(self.evaluate('!!linux', 'x64-linux'))
+        # '&' binds tighter than '|'
+        self.assertTrue(self.evaluate('osx | linux & x64', 'x64-linux'))
+        self.assertFalse(self.evaluate('(osx | linux) & arm64', 'x64-linux'))
+
+    def test_empty_expressions_are_always_true(self):
+        self.assertIs(compile_platform_expression(None), licencpp.always_true)
+        self.assertIs(compile_platform_expression(''), licencpp.always_true)
+
+    def test_expressions_are_compiled_once(self):
+        self.assertIs(compile_platform_expression('windows & !uwp'), compile_platform_expression('windows & !uwp'))
+
+    def test_malformed_expressions_raise(self):
+        for expression in ('windows &', '(linux', 'linux)', '!', 'linux osx', 'linux $ osx', '| linux'):
+            with self.assertRaises(PlatformExpressionError, msg=expression):
+                compile_platform_expression(expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
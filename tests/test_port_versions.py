@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+# Version selection through the versions database, on small vcpkg-like git repositories built in a temporary folder
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import licencpp  # noqa: E402
+
+
+def git(repository, *arguments, input=None):
+    return subprocess.run(['git', '-C', repository] + list(arguments), input=input, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode().strip()
+
+
+# Creates a git repository with ports/, versions/<x>-/<port>.json and versions/baseline.json.
+# ports is {name: [manifest, ...]}, oldest version first, and the baseline is the first version of each port.
+# Returns (ports folder, builtin-baseline commit).
+def build_vcpkg_repository(root, ports):
+    repository = os.path.join(root, 'vcpkg')
+    os.makedirs(os.path.join(repository, 'versions'))
+    git(repository, 'init', '-q')
+    baseline = {}
+    for name, manifests in ports.items():
+        entries = []
+        for manifest in manifests:
+            blob = git(repository, 'hash-object', '-w', '--stdin', input=json.dumps(manifest).encode())
+            tree = git(repository, 'mktree', input=f'100644 blob {blob}\tvcpkg.json\n'.encode())
+            entries.insert(0, {'git-tree': tree, 'version': manifest['version'], 'port-version': 0})
+        baseline[name] = {'baseline': manifests[0]['version'], 'port-version': 0}
+        os.makedirs(os.path.join(repository, 'ports', name))
+        with open(os.path.join(repository, 'ports', name, 'vcpkg.json'), 'w') as file:
+            json.dump(manifests[-1], file)
+        os.makedirs(os.path.join(repository, 'versions', f'{name[0]}-'), exist_ok=True)
+        with open(os.path.join(repository, 'versions', f'{name[0]}-', f'{name}.json'), 'w') as file:
+            json.dump({'versions': entries}, file)
+    with open(os.path.join(repository, 'versions', 'baseline.json'), 'w') as file:
+        json.dump({'default': baseline}, file)
+    git(repository, 'add', '-A')
+    git(repository, '-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'ports')
+    return os.path.join(repository, 'ports'), git(repository, 'rev-parse', 'HEAD')
+
+
+class PortVersionsTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.registry.close()
+        self.root.cleanup()
+
+    def create_registry(self, ports):
+        ports_dir, self.baseline = build_vcpkg_repository(self.root.name, ports)
+        self.registry = licencpp.PortRegistry(ports_dir, use_cache=False)
+
+    def resolve(self, dependencies, features=(), triplet='x64-linux', resolver='native'):
+        project_data = {'name': 'project', 'version': '1.0.0', 'builtin-baseline': self.baseline,
+                        'dependencies': dependencies,
+                        'features': {'extra': {'description': 'extra', 'dependencies': dependencies}}}
+        port_versions = self.registry.get_port_versions(project_data)
+        if resolver == 'native':
+            nodes, links = licencpp.resolve_graph(project_data, self.registry, features, 'native',
+                                                  port_versions=port_versions, triplet=triplet)
+        else:
+            # What the vcpkg resolver leaves to select(): the nodes, without the enabled features
+            nodes = ['project'] + [dependency if isinstance(dependency, str) else dependency['name']
+                                   for dependency in dependencies]
+            links = []
+        port_git_trees = port_versions.select(nodes, features, triplet)
+        versions = {node: self.registry.load_port_manifest(node, port_git_trees[node])[1]['version']
+                    for node in nodes if port_git_trees[node] is not None}
+        return set(nodes), set(links), versions
+
+    def test_raised_version_is_walked_whatever_the_dependency_order(self):
+        self.create_registry({
+            'foo': [{'name': 'foo', 'version': '1.0.0'},
+                    {'name': 'foo', 'version': '2.0.0', 'dependencies': ['baz']}],
+            'bar': [{'name': 'bar', 'version': '1.0.0', 'dependencies': [{'name': 'foo', 'version>=': '2.0.0'}]}],
+            'baz': [{'name': 'baz', 'version': '1.0.0'}],
+        })
+        for dependencies in (['foo', 'bar'], ['bar', 'foo']):
+            nodes, links, versions = self.resolve(dependencies)
+            self.assertEqual(nodes, {'project', 'foo', 'bar', 'baz'}, dependencies)
+            self.assertIn(('foo', 'baz'), links, dependencies)
+            self.assertEqual(versions['foo'], '2.0.0', dependencies)
+
+    def test_constraints_of_disabled_features_are_ignored(self):
+        self.create_registry({
+            'foo': [{'name': 'foo', 'version': '2.0.0', 'license': 'Apache-2.0'},
+                    {'name': 'foo', 'version': '3.0.0', 'license': 'BSL-1.0'}],
+            'bar': [{'name': 'bar', 'version': '1.0.0',
+                     'features': {'extra': {'description': 'extra',
+                                            'dependencies': [{'name': 'foo', 'version>=': '3.0.0'}]}}}],
+        })
+        for resolver in ('native', 'vcpkg'):
+            self.assertEqual(self.resolve(['bar', 'foo'], resolver=resolver)[2]['foo'], '2.0.0', resolver)
+        self.assertEqual(self.resolve([{'name': 'bar', 'features': ['extra']}, 'foo'])[2]['foo'], '3.0.0')
+
+    def test_constraints_follow_the_platform(self):
+        self.create_registry({
+            'foo': [{'name': 'foo', 'version': '2.0.0'}, {'name': 'foo', 'version': '3.0.0'}],
+            'bar': [{'name': 'bar', 'version': '1.0.0',
+                     'dependencies': [{'name': 'foo', 'version>=': '3.0.0', 'platform': 'windows'}]}],
+        })
+        for resolver in ('native', 'vcpkg'):
+            self.assertEqual(self.resolve(['bar', 'foo'], triplet='x64-linux', resolver=resolver)[2]['foo'], '2.0.0')
+            self.assertEqual(self.resolve(['bar', 'foo'], triplet='x64-windows', resolver=resolver)[2]['foo'], '3.0.0')
+
+    def test_project_constraints_only_count_for_enabled_features(self):
+        self.create_registry({
+            'foo': [{'name': 'foo', 'version': '2.0.0'}, {'name': 'foo', 'version': '3.0.0'}],
+        })
+        self.assertEqual(self.resolve([])[2], {})
+        project_data = {'name': 'project', 'builtin-baseline': self.baseline, 'dependencies': ['foo'],
+                        'features': {'new': {'description': 'new',
+                                             'dependencies': [{'name': 'foo', 'version>=': '3.0.0'}]}}}
+        for features, version in (((), '2.0.0'), (('new',), '3.0.0')):
+            port_versions = self.registry.get_port_versions(project_data)
+            nodes, _ = licencpp.resolve_graph(project_data, self.registry, features, 'native',
+                                              port_versions=port_versions, triplet='x64-linux')
+            git_tree = port_versions.select(nodes, features, 'x64-linux')['foo']
+            self.assertEqual(self.registry.load_port_manifest('foo', git_tree)[1]['version'], version, features)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import spdx_licenses  # noqa: E402
+from spdx_licenses import LicenseExpressionError, normalize_license_expression, parse_license_expression  # noqa: E402
+
+
+class ParseLicenseExpressionTest(unittest.TestCase):
+    def test_precedence_and_rendering(self):
+        node = parse_license_expression('BSL-1.0 AND (MIT OR Apache-2.0)')
+        self.assertIsInstance(node, spdx_licenses.AndExpression)
+        self.assertEqual(str(node), 'BSL-1.0 AND (MIT OR Apache-2.0)')
+        self.assertEqual(node.get_license_ids(), ['BSL-1.0', 'MIT', 'Apache-2.0'])
+        # WITH binds tighter than AND, which binds tighter than OR
+        node = parse_license_expression('MIT OR Zlib AND Apache-2.0 WITH LLVM-exception')
+        self.assertIsInstance(node, spdx_licenses.OrExpression)
+        self.assertEqual(str(node), 'MIT OR (Zlib AND Apache-2.0 WITH LLVM-exception)')
+
+    def test_nested_operators_are_flattened(self):
+        self.assertEqual(str(parse_license_expression('MIT AND (Zlib AND (BSL-1.0))')), 'MIT AND Zlib AND BSL-1.0')
+
+    def test_identical_expressions_are_interned(self):
+        self.assertIs(parse_license_expression('mit or zlib'), parse_license_expression('MIT OR Zlib'))
+        self.assertIs(parse_license_expression('GPL-2.0'), parse_license_expression('GPL-2.0-only'))
+
+    def test_case_and_deprecated_identifiers_are_normalized(self):
+        self.assertEqual(normalize_license_expression('apache-2.0 with llvm-exception'), 'Apache-2.0 WITH LLVM-exception')
+        self.assertEqual(normalize_license_expression('GPL-2.0'), 'GPL-2.0-only')
+        self.assertEqual(normalize_license_expression('GPL-2.0+'), 'GPL-2.0-or-later')
+        self.assertEqual(normalize_license_expression('LGPL-2.1 OR MIT'), 'LGPL-2.1-only OR MIT')
+        self.assertEqual(normalize_license_expression('GPL-2.0-with-classpath-exception'),
+                         'GPL-2.0-only WITH Classpath-exception-2.0')
+        self.assertEqual(normalize_license_expression('Apache-2.0+'), 'Apache-2.0+')
+
+    def test_or_later_maps_onto_the_or_later_identifier(self):
+        self.assertEqual(normalize_license_expression('GPL-2.0-with-classpath-exception+'),
+                         'GPL-2.0-or-later WITH Classpath-exception-2.0')
+        self.assertEqual(normalize_license_expression('GPL-2.0-only+'), 'GPL-2.0-or-later')
+        self.assertEqual(normalize_license_expression('GPL-2.0-or-later+'), 'GPL-2.0-or-later')
+        self.assertEqual(normalize_license_expression('lgpl-2.1-only+ or MIT'), 'LGPL-2.1-or-later OR MIT')
+        self.assertEqual(normalize_license_expression('BSD-2-Clause-FreeBSD+'), 'BSD-2-Clause+')
+
+    def test_unknown_identifiers_become_license_refs(self):
+        self.assertEqual(normalize_license_expression('MIT AND Vendor-1.0'), 'MIT AND LicenseRef-Vendor-1.0')
+        self.assertEqual(normalize_license_expression('LicenseRef-Vendor'), 'LicenseRef-Vendor')
+
+    def test_license_refs_are_checked_and_their_prefixes_normalized(self):
+        self.assertEqual(normalize_license_expression('licenseref-foo'), 'LicenseRef-foo')
+        self.assertEqual(normalize_license_expression('documentref-spdx:LICENSEREF-foo.1'),
+                         'DocumentRef-spdx:LicenseRef-foo.1')
+        for expression in ('LicenseRef-', 'LicenseRef-a:b', 'LicenseRef-foo+', 'DocumentRef-x',
+                           'DocumentRef-x:foo', 'DocumentRef-:LicenseRef-foo', 'MIT AND LicenseRef-a:b'):
+            with self.assertRaises(LicenseExpressionError, msg=expression):
+                parse_license_expression(expression)
+        self.assertEqual(normalize_license_expression('LicenseRef-a:b'), 'LicenseRef-a-b')
+        self.assertEqual(normalize_license_expression('LicenseRef-foo+'), 'LicenseRef-foo')
+        self.assertEqual(normalize_license_expression('DocumentRef-x'), 'LicenseRef-DocumentRef-x')
+        self.assertIsNone(normalize_license_expression('LicenseRef-'))
+
+    def test_invalid_expressions_raise(self):
+        for expression in ('', 'MIT OR', '(MIT', 'MIT)', 'MIT Zlib', 'MIT / Zlib', '-', 'MIT OR :',
+                           'MIT WITH Foo', 'MIT WITH', 'wxWindows WITH Foo',
+                           'wxWindows WITH Classpath-exception-2.0', '(MIT) WITH LLVM-exception'):
+            with self.assertRaises(LicenseExpressionError, msg=expression):
+                parse_license_expression(expression)
+
+
+class NormalizeLicenseExpressionTest(unittest.TestCase):
+    def test_missing_licenses(self):
+        self.assertIsNone(normalize_license_expression(None))
+        self.assertIsNone(normalize_license_expression('  '))
+
+    def test_invalid_expressions_fall_back_to_a_license_ref(self):
+        self.assertEqual(normalize_license_expression('public domain'), 'LicenseRef-public-domain')
+        self.assertEqual(normalize_license_expression('MIT/X11'), 'LicenseRef-MIT-X11')
+        self.assertEqual(normalize_license_expression('MIT WITH Foo'), 'LicenseRef-MIT-WITH-Foo')
+        self.assertEqual(normalize_license_expression('wxWindows WITH Foo'), 'LicenseRef-wxWindows-WITH-Foo')
+
+    def test_strings_without_an_idstring_give_none(self):
+        for expression in ('-', ':', '--'):
+            self.assertIsNone(normalize_license_expression(expression), expression)
+        self.assertEqual(normalize_license_expression('MIT OR :'), 'LicenseRef-MIT-OR')
+
+    def test_results_are_strings(self):
+        for expression in ('MIT', 'mit and (zlib or :)', '+', 'GPL-2.0+ WITH Classpath-exception-2.0', '()'):
+            result = normalize_license_expression(expression)
+            self.assertTrue(result is None or isinstance(result, str), expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# SPDX-License-Identifier: MIT
+"""
+This file is part of licencpp, which is released under the MIT License.
+See file LICENSE or go to https://opensource.org/licenses/MIT for full license details.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import licencpp  # noqa: E402
+
+
+def touch(path, text):
+    with open(path, 'w') as file:
+        file.write(text)
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify is Linux only')
+class InotifyWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.watcher = licencpp.InotifyWatcher(['vcpkg.json'], 0.01)
+
+    def tearDown(self):
+        self.watcher.close()
+        self.root.cleanup()
+
+    def make_port(self, name):
+        os.makedirs(os.path.join(self.root.name, name))
+        path = os.path.join(self.root.name, name, 'vcpkg.json')
+        touch(path, '{}')
+        return path
+
+    def test_manifest_changes_are_reported(self):
+        path = self.make_port('foo')
+        self.watcher.set_paths([path])
+        self.assertFalse(self.watcher.wait(0.05))
+        touch(os.path.join(self.root.name, 'foo', 'notes.txt'), 'x')
+        self.assertFalse(self.watcher.wait(0.05))
+        touch(path, '{"name": "foo"}')
+        self.assertTrue(self.watcher.wait(1))
+
+    def test_folders_that_cannot_be_watched_are_polled(self):
+        watched, unwatched = self.make_port('foo'), self.make_port('bar')
+        libc = self.watcher.libc
+
+        # inotify_add_watch fails for the folder of the second port, as it does once max_user_watches is used up
+        class FailingLibc:
+            def __getattr__(self, name):
+                return getattr(libc, name)
+
+            def inotify_add_watch(self, fd, directory, mask):
+                if os.fsdecode(directory) == os.path.dirname(unwatched):
+                    return -1
+                return libc.inotify_add_watch(fd, directory, mask)
+
+        self.watcher.libc = FailingLibc()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.watcher.set_paths([watched, unwatched])
+        self.assertIn('inotify cannot watch 1 folders', output.getvalue())
+        self.assertEqual(list(self.watcher.polling.signatures), [unwatched])
+        self.assertFalse(self.watcher.wait(0.05))
+        touch(unwatched, '{"name": "bar", "version": "2"}')
+        self.assertTrue(self.watcher.wait(1))
+        touch(watched, '{"name": "foo", "version": "2"}')
+        self.assertTrue(self.watcher.wait(1))
+
+
+if __name__ == '__main__':
+    unittest.main()